@@ -8,12 +8,12 @@
     :license: MIT, see LICENSE for more details.
 """
 import inspect
-from limits.storage import storage_from_string, Storage
-from limits.strategies import STRATEGIES, RateLimiter
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
 import logging
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, Optional
 
-from falcon_limiter.middleware import Middleware, _DECORABLE_METHOD_NAME
+from falcon_limiter.middleware import LimitSpec, Middleware, RejectCache, _RESPONDER_NAMES
 from falcon_limiter.utils import get_remote_addr
 
 logger = logging.getLogger(__name__)
@@ -55,7 +55,11 @@ class Limiter:
         storage (:obj:`Storage`): The storage backend that will be used to store the rate limits.
         limiter (:obj:`RateLimiter`): A `RateLimiter` object from the `limits` library, representing the rate limiting
                                       strategy and storage.
+        reject_cache (:obj:`RejectCache`): The per-process cache of the recently rejected keys, when the
+                                           'RATELIMIT_REJECT_CACHE' config is set - otherwise None.
     """
+    __slots__ = ('key_func', 'default_limits', 'default_deduct_when', 'default_dynamic_limits', 'config',
+                 'storage', 'limiter', 'reject_cache', '_key_prefix', '_hit', '_test', '_middleware')
 
     def __init__(self,
                  key_func: Callable=get_remote_addr,
@@ -68,10 +72,13 @@ class Limiter:
             config = {}
 
         # set the defaults for the config
+        config.setdefault('RATELIMIT_STORAGE', None)
         config.setdefault('RATELIMIT_STORAGE_URL', 'memory://')
         config.setdefault('RATELIMIT_STORAGE_OPTIONS', {})
         config.setdefault('RATELIMIT_STRATEGY', 'fixed-window')
         config.setdefault('RATELIMIT_KEY_PREFIX', '')
+        config.setdefault('RATELIMIT_REJECT_CACHE', False)
+        config.setdefault('RATELIMIT_REJECT_CACHE_SIZE', 10000)
 
         self.key_func = key_func
         self.default_limits = default_limits
@@ -79,19 +86,49 @@ class Limiter:
         self.default_dynamic_limits = default_dynamic_limits
         self.config = config
 
-        self.storage = storage_from_string(self.config['RATELIMIT_STORAGE_URL'],
-                                           **self.config['RATELIMIT_STORAGE_OPTIONS'])
+        if self.config['RATELIMIT_STORAGE'] is not None:
+            # an already built storage, eg to share its connection pool with other limiters
+            self.storage = self.config['RATELIMIT_STORAGE']
+        else:
+            self.storage = storage_from_string(self.config['RATELIMIT_STORAGE_URL'],
+                                               **self.config['RATELIMIT_STORAGE_OPTIONS'])
 
         self.limiter = STRATEGIES[self.config['RATELIMIT_STRATEGY']](self.storage)
 
+        self.reject_cache = RejectCache(maxsize=self.config['RATELIMIT_REJECT_CACHE_SIZE']) \
+            if self.config['RATELIMIT_REJECT_CACHE'] else None
+
+        # resolved only once, so the middleware doesn't need to look these up on every request:
+        # the prefix of the keys (eg 'myapp:' or '' when there is no prefix) and the hit/test
+        # methods of the rate limiting strategy
+        self._key_prefix = f"{self.config['RATELIMIT_KEY_PREFIX']}:" if self.config['RATELIMIT_KEY_PREFIX'] else ''
+        self._hit = self.limiter.hit
+        self._test = self.limiter.test
+
+        # the middleware is only created once, so the limit settings it resolves are kept between its uses
+        self._middleware = None
+
         if not self.storage.check():
-            logger.error(f"The storage backend has failed its check, please verify the provided storage settings!")
+            logger.error("The storage backend has failed its check, please verify the provided storage settings!")
 
     @property
     def middleware(self) -> 'Middleware':
         """ Falcon middleware integration
         """
-        return Middleware(limiter=self)
+        if self._middleware is None:
+            self._middleware = Middleware(limiter=self)
+        return self._middleware
+
+    def finalize(self, app) -> None:
+        """ Resolves the limit settings of the responders of all the resources already added to the app,
+        so this doesn't need to happen on the first request of each of them
+
+        Call it after all the routes were added to the app.
+
+        Args:
+            app: The Falcon app using the middleware of this limiter
+        """
+        self.middleware.finalize(app)
 
     def limit(self, limits: str=None, deduct_when: Callable=None,
               key_func: Callable=None, dynamic_limits: Callable=None) -> Callable:
@@ -116,44 +153,48 @@ class Limiter:
                                        based on the Falcon request method arguments (req, resp, resource, params).
                                        It is expected to return a 'limits' string like '1/second;3 per hour'.
         """
+        # the arguments of the decorator, with the limits (falling back to the default limits) already
+        # parsed, so these can be picked up in the process_resource method in middleware.py
+        # without any further processing
+        spec = LimitSpec(limits=limits or self.default_limits, deduct_when=deduct_when,
+                         key_func=key_func, dynamic_limits=dynamic_limits)
+
+        def limit_wrap_of(method: Callable) -> Callable:
+            # wraps the method, so the arguments of the decorator can be stored without changing the method itself
+            def limit_wrap(cls, req, resp, *args, **kwargs):
+                return method(cls, req, resp, *args, **kwargs)
+
+            limit_wrap._limit_spec = spec  # type: ignore
+            return limit_wrap
+
         def wrap1(class_or_method, *args):
             # is this about decorating a class or a given method?
             if inspect.isclass(class_or_method):
-                # get all methods of the class that needs to be decorated (eg start with "on_"):
-                for attr in dir(class_or_method):
-                    if callable(getattr(class_or_method, attr)) and _DECORABLE_METHOD_NAME.match(attr):
+                # get all responders of the class that needs to be decorated (eg "on_get"):
+                for attr in _RESPONDER_NAMES:
+                    if callable(getattr(class_or_method, attr, None)):
                         # decorate the given method, but not if it was already
                         # decorated on the method level
-                        if not hasattr(getattr(class_or_method, attr), '_Limiter__limits_decorated'):
-                            setattr(class_or_method, attr, wrap1(getattr(class_or_method, attr)))
+                        if not hasattr(getattr(class_or_method, attr), '_limit_spec'):
+                            # wrapped instead of marked in place, as the same function might be
+                            # the responder of other classes too (eg an inherited method or a shared helper)
+                            setattr(class_or_method, attr, limit_wrap_of(getattr(class_or_method, attr)))
 
                 return class_or_method
             else:  # this is to decorate the individual method
-                def limit_wrap(cls, req, resp, *args, **kwargs):
-                    class_or_method(cls, req, resp, *args, **kwargs)
-
-                # mark the fact that this method has already been decorated:
-                limit_wrap.__limits_decorated = True
-
-                # store the arguments of the decorator on the function, so
-                # these can be picked up in the process_resource method in middleware.py
-                limit_wrap.__limits = limits
-                limit_wrap.__deduct_when = deduct_when
-                limit_wrap.__key_func = key_func
-                limit_wrap.__dynamic_limits = dynamic_limits
-
-                return limit_wrap
-
-        # this is the name which will check for if the decorator was registered with the register()
-        # function, as this decorator is not the topmost one
-        wrap1._decorator_name = 'limit'  # type: ignore
+                # store the arguments of the decorator on the method itself, which also marks
+                # the fact that this method has already been decorated - so there is no wrapper
+                # to be called on every request
+                try:
+                    class_or_method._limit_spec = spec
+                except AttributeError:
+                    # the method does not allow setting attributes on it (eg a bound method)
+                    return limit_wrap_of(class_or_method)
+                return class_or_method
 
         # store the arguments of the decorator on the wrap1 function too
         # - for when there are multiple decorators registered with the register() utility,
         # so these can be picked up in the process_resource method in middleware.py
-        wrap1._limits = limits  # type: ignore
-        wrap1._deduct_when = deduct_when  # type: ignore
-        wrap1._key_func = key_func  # type: ignore
-        wrap1._dynamic_limits = dynamic_limits  # type: ignore
+        wrap1._limit_spec = spec  # type: ignore
 
         return wrap1
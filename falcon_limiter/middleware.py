@@ -1,169 +1,297 @@
 from falcon import HTTP_429, HTTPTooManyRequests, COMBINED_METHODS
 from limits import parse as parse_limits
+from collections import OrderedDict
+from functools import lru_cache
 import logging
-import re
-from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple, Iterable, Union
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, NamedTuple, Optional, Tuple, Iterable, Union
+from weakref import WeakKeyDictionary
+
+from falcon_limiter.utils import get_remote_addr
 
 if TYPE_CHECKING:
     from falcon_limiter.limiter import Limiter
+    from falcon import Request, Response
     from limits import RateLimitItem
 
 logger = logging.getLogger(__name__)
 
-_DECORABLE_METHOD_NAME = re.compile(r'^on_({})(_\w+)?$'.format(
-    '|'.join(method.lower() for method in COMBINED_METHODS)))
+# the name of the responder ("on_..." method) of each HTTP method, eg {'GET': 'on_get'}
+_ON_NAMES = {method: 'on_' + method.lower() for method in COMBINED_METHODS}
+
+# the names of all the responders which can be decorated with a limit
+_RESPONDER_NAMES = frozenset(_ON_NAMES.values())
+
+# the responders ("on_..." methods) of each resource class keyed by the HTTP method,
+# so we don't need to look them up on every request
+_RESPONDER_CACHE = WeakKeyDictionary()  # type: WeakKeyDictionary
+
+
+def _get_responders(resource_cls: type) -> Dict[str, str]:
+    """ Returns the responder names of a resource class keyed by the HTTP method
+    they handle (eg {'GET': 'on_get'}), building it on the first call for the given class
+    """
+    responders = _RESPONDER_CACHE.get(resource_cls)
+    if responders is None:
+        responders = {method: name for method, name in _ON_NAMES.items()
+                      if callable(getattr(resource_cls, name, None))}
+        _RESPONDER_CACHE[resource_cls] = responders
+    return responders
+
+
+def _iter_resources(app) -> Iterator[Any]:
+    """ Yields the resources added to the given Falcon app, by walking the nodes of its
+    (default, compiled) router - yields nothing when the app uses a router without such nodes
+    """
+    nodes = list(getattr(getattr(app, '_router', None), '_roots', ()))
+    while nodes:
+        node = nodes.pop()
+        if node.resource is not None:
+            yield node.resource
+        nodes.extend(node.children)
+
+
+def _fill_limit_meta(middleware, app) -> None:
+    """ Resolves the limit settings of the responders of all the resources already added to the app
+    into the limit meta cache of the given (sync or async) middleware - see Middleware.finalize()
+    """
+    for resource in _iter_resources(app):
+        for method in _get_responders(type(resource)):
+            meta_key = (type(resource), method)
+            if meta_key not in middleware._limit_meta:
+                middleware._limit_meta[meta_key] = middleware._get_limit_meta(resource, method)
+
+
+@lru_cache(maxsize=256)
+def _parse_one(limit: str) -> 'RateLimitItem':
+    """ Parses a single limit (eg '5 per minute') into a rule
+
+    The results are memoized, so the same limit used by different strings of limits
+    (eg '5 per minute' and '5 per minute;2 per second') is only parsed once and shares its rule object.
+    """
+    return parse_limits(limit)
+
+
+@lru_cache(maxsize=1024)
+def _parse_limits_cached(limits: str) -> Tuple['RateLimitItem', ...]:
+    """ Parses a string of limits (eg '5 per minute,2 per second') into a tuple of rules
+
+    The results are memoized, as the same limits are parsed over and over again - especially
+    the ones returned by the dynamic_limits functions, which are parsed on every request.
+    """
+    if ';' not in limits and ',' not in limits:
+        # a single limit (the most common case), so there is nothing to split
+        return (_parse_one(limits.strip()),)
+    # the limits can be separated by either ';' or ',' (eg '5 per minute,2 per second')
+    return tuple(_parse_one(l.strip()) for l in limits.replace(',', ';').split(';') if l.strip())
+
+
+def _parse_limits(limits: Union[str, Iterable[str]]) -> Tuple['RateLimitItem', ...]:
+    """ Takes a string of limits (eg '5 per minute,2 per second') or an iterable
+    of limits (eg ['5 per minute', '2 per second']) and sends each to be parsed into
+    a proper rule and returns a tuple of these parsed rules.
+    """
+    if isinstance(limits, str):
+        return _parse_limits_cached(limits)
+    # 'limits' is an iterable - each of its items is parsed (and memoized) on its own
+    return tuple(_limit for _item in limits for _limit in _parse_limits_cached(_item))
+
+
+@lru_cache(maxsize=1024)
+def _limit_message(limit: 'RateLimitItem') -> str:
+    """ Returns the message of the 429 error for the given limit,
+    eg "Reached allowed limit 5 hits per 1 minute!"
+
+    The messages are memoized, as the same keys tend to hit the same limits over and over again.
+    """
+    return f"Reached allowed limit {limit.amount} hits per {limit.multiples} {limit.GRANULARITY.name}!"
+
+
+class LimitSpec:
+    """ The arguments of a limit() decorator, attached to the decorated responder
+
+    The limits are parsed at decoration time, so this doesn't need to happen at request time.
+    """
+    __slots__ = ('limits', 'parsed_limits', 'deduct_when', 'key_func', 'dynamic_limits')
+
+    def __init__(self, limits: Union[str, Iterable[str], None], deduct_when: Optional[Callable],
+                 key_func: Optional[Callable], dynamic_limits: Optional[Callable]) -> None:
+        self.limits = limits
+        self.parsed_limits = _parse_limits(limits) if limits else ()
+        self.deduct_when = deduct_when
+        self.key_func = key_func
+        self.dynamic_limits = dynamic_limits
+
+
+class RejectCache:
+    """ A per-process cache of the (limit, key) pairs which were rejected recently, kept until
+    the window of the given limit resets
+
+    While a key is over its limit, its requests can be rejected without a round-trip to the storage.
+    This is a soft cache only - the hard limit is still kept by the storage backend, which also
+    remains the one shared by all the processes.
+
+    Args:
+        maxsize (int): The maximum number of the (limit, key) pairs stored, after which the oldest
+                       ones are evicted
+    """
+    __slots__ = ('maxsize', '_expiries')
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._expiries = OrderedDict()  # type: OrderedDict
+
+    def __contains__(self, item: Tuple['RateLimitItem', str]) -> bool:
+        expiry = self._expiries.get(item)
+        if expiry is None:
+            return False
+        if expiry <= time.time():
+            # the window of the limit has reset since
+            self._expiries.pop(item, None)
+            return False
+        return True
+
+    def add(self, item: Tuple['RateLimitItem', str], expiry: float) -> None:
+        """ Stores a rejected (limit, key) pair until the given expiry (as a unix timestamp) """
+        self._expiries.pop(item, None)
+        self._expiries[item] = expiry
+        while len(self._expiries) > self.maxsize:
+            try:
+                self._expiries.popitem(last=False)
+            except KeyError:
+                break
+
+    def clear(self) -> None:
+        """ Removes all the stored items - eg after the storage was reset """
+        self._expiries.clear()
+
+
+class LimitMeta(NamedTuple):
+    """ The resolved limit settings of a given responder """
+    limits: Any
+    parsed_limits: Tuple['RateLimitItem', ...]
+    key_func: Optional[Callable]
+    deduct_when: Optional[Callable]
+    dynamic_limits: Optional[Callable]
 
 
 class Middleware:
     """ It integrates a Limiter object with Falcon by turning it into
     a Falcon Middleware
     """
+    __slots__ = ('limiter', '_key_prefix', '_hit', '_test', '_limit_meta')
 
     def __init__(self, limiter: 'Limiter') -> None:
         self.limiter = limiter
 
-    def process_resource(self, req, resp, resource, params):
+        # bound once, so these don't need to be looked up through the limiter on every request
+        self._key_prefix = limiter._key_prefix
+        self._hit = limiter._hit
+        self._test = limiter._test
+
+        # the resolved limit settings of each (resource class, HTTP method) pair, filled in
+        # on the first request - None means that the given responder has no limit
+        self._limit_meta = {}  # type: Dict[Tuple[type, str], Optional[LimitMeta]]
+
+    def finalize(self, app) -> None:
+        """ Resolves the limit settings of the responders of all the resources already added to the app,
+        so this doesn't need to happen on the first request of each of them - see Limiter.finalize()
+        """
+        _fill_limit_meta(self, app)
+
+    def process_resource(self, req: 'Request', resp: 'Response', resource: Any,
+                         params: Dict[str, Any]) -> None:
         """ Determine if the given request is marked for limiting and if yes,
         then whether it should be counted against the limit and check whether it is above the limit
         """
         ########
         # Step 1: determine whether the given responder has a limit setup
         # and if not then short-circuit
-        # if there is a limit, then store that, the parsed limit, the key_func and the deduct_when
-        # on the resource for each method
+        # the limit settings are only looked up on the first request for each resource class and method
+        method = req.method
+        meta_key = (type(resource), method)
+        try:
+            meta = self._limit_meta[meta_key]
+        except KeyError:
+            meta = self._limit_meta[meta_key] = self._get_limit_meta(resource, method)
 
-        # find out which responder ("on_..." method) is going to be used to process this request
-        responder = None
-        for _method in dir(resource):
-            if _DECORABLE_METHOD_NAME.match(_method) and _method[3:].upper() == req.method.upper():
-                responder = _method
-                break
-
-        if responder:
-            # get the name of the responder wrapper, which for objects decorated with a limiter is 'limit_wrap'
-            # see the "Limiter.limit" decorator in limiter.py
-            responder_wrapper_name = getattr(getattr(resource, responder), '__name__')
-
-            # is the given method (or its class) decorated by the limit_wrap being the topmost decorator?
-            if responder_wrapper_name == 'limit_wrap':
-                logger.debug(" This endpoint is decorated by 'limit' being the topmost decorator.")
-
-                # the arguments provided in the decorator (if any):
-                decorator_limits = getattr(getattr(resource, responder), '_Limiter__limits')
-                decorator_deduct_when = getattr(getattr(resource, responder), '_Limiter__deduct_when')
-                decorator_key_func = getattr(getattr(resource, responder), '_Limiter__key_func')
-                decorator_dynamic_limits = getattr(getattr(resource, responder), '_Limiter__dynamic_limits')
-            else:
-                # 'limit_wrap' is not the topmost decorator - let's check whether 'limit' is
-                # any of the other decorator on this method (not the topmost):
-                # this requires the use of @register(decor1, decor2) as the decorator
-                if hasattr(getattr(resource, responder), '_decorators') and \
-                        'limit' in [d._decorator_name for d in getattr(resource, responder)._decorators
-                                   if hasattr(d, '_decorator_name')]:
-
-                    # pick up the limit decorator attributes from the wrap1 of the decorator:
-                    for d in getattr(resource, responder)._decorators:
-                        if hasattr(d, '_decorator_name') and getattr(d, '_decorator_name') == 'limit':
-                            decorator_limits = getattr(d, '_limits')
-                            decorator_deduct_when = getattr(d, '_deduct_when')
-                            decorator_key_func = getattr(d, '_key_func')
-                            decorator_dynamic_limits = getattr(d, '_dynamic_limits')
-                            break
-
-                    logger.debug(" This endpoint is decorated by 'limit', but it is NOT the topmost decorator.")
-                else:
-                    # no limit was requested on this responder as no decorator at all
-                    logger.debug(" No 'limit' was requested for this endpoint.")
-                    return
-
-            logger.debug(" This endpoint is decorated with a limit")
-
-            # set the 'limits', 'parsed_limits', 'key_func' and 'deduct_when' on the resource if doesn't exist yet
-            if not hasattr(resource, f'_{req.method}_limits'):
-                _limits = decorator_limits if decorator_limits else self.limiter.default_limits
-                setattr(resource, f'_{req.method}_limits', _limits)
-
-                # parse the limits into a list of RateLimitItem objects
-                _parsed_limits = self.parse_limits(limits=_limits) if _limits else []
-
-                setattr(resource, f'_{req.method}_parsed_limits', _parsed_limits)
-                logger.debug(f" The limits parsed into RateLimitItem object(s) are: {_parsed_limits}")
-
-                setattr(resource,
-                        f'_{req.method}_key_func',
-                        decorator_key_func if decorator_key_func else
-                        self.limiter.key_func if hasattr(self.limiter, 'key_func') else None)
-                setattr(resource,
-                        f'_{req.method}_deduct_when',
-                        decorator_deduct_when if decorator_deduct_when else
-                        self.limiter.default_deduct_when if hasattr(self.limiter, 'default_deduct_when') else None)
-                setattr(resource,
-                        f'_{req.method}_dynamic_limits',
-                        decorator_dynamic_limits if decorator_dynamic_limits else
-                        self.limiter.default_dynamic_limits if hasattr(self.limiter, 'default_dynamic_limits')
-                        else None)
-
-        if not hasattr(resource, f'_{req.method}_limits'):
-            logger.debug(" No limits on this resource/method.")
+        if meta is None:
+            # no limits on this resource/method - already logged when its limit settings were looked up,
+            # so the requests of the unlimited routes return without any further call
             return
 
-        # get the attributes from the resource
-        _limits = getattr(resource, f'_{req.method}_limits')
-        _parsed_limits = getattr(resource, f'_{req.method}_parsed_limits')
-        _key_func = getattr(resource, f'_{req.method}_key_func')
-        _deduct_when = getattr(resource, f'_{req.method}_deduct_when')
-        _dynamic_limits = getattr(resource, f'_{req.method}_dynamic_limits')
-        logger.debug(f" The limits to be used: {_limits}")
-        logger.debug(f" The parsed_limits to be used: {_parsed_limits}")
-        logger.debug(f" The key_func function to be used: {_key_func}")
-        logger.debug(f" The deduct_when function to be used: {_deduct_when}")
-        logger.debug(f" The dynamic_limits function to be used: {_dynamic_limits}")
+        _limits, _parsed_limits, _key_func, _deduct_when, _dynamic_limits = meta
+        logger.debug(" The limits to be used: %s", _limits)
+        logger.debug(" The parsed_limits to be used: %s", _parsed_limits)
+        logger.debug(" The key_func function to be used: %s", _key_func)
+        logger.debug(" The deduct_when function to be used: %s", _deduct_when)
+        logger.debug(" The dynamic_limits function to be used: %s", _dynamic_limits)
 
         # if dynamic limits have been requested, then that will overwrite whatever (if anything)
         # is provided via the 'limits'
         if _dynamic_limits:
             _limits = _dynamic_limits(req, resp, resource, params)
             # parse the limits into a list of RateLimitItem objects
-            _parsed_limits = self.parse_limits(limits=_limits) if _limits else []
-        # print(_parsed_limits)
+            _parsed_limits = self.parse_limits(limits=_limits) if _limits else ()
 
         if not _limits or not _parsed_limits:
-            logger.debug(f" There was no 'limits' (or dynamic_limits) set on this endpoint,"
-                         f" so no reason to check the limits.")
+            logger.debug(" There was no 'limits' (or dynamic_limits) set on this endpoint,"
+                         " so no reason to check the limits.")
             return
 
         #########
         # Step 2: hit the limit(s) of the given key and throw error 429 if we are above
 
         # build the key with the key prefix and the key_func provided
-        if 'RATELIMIT_KEY_PREFIX' in self.limiter.config and self.limiter.config['RATELIMIT_KEY_PREFIX']:
-            _key = "{key_prefix}:{key}".format(
-                key_prefix=self.limiter.config['RATELIMIT_KEY_PREFIX'],
-                key=_key_func(req, resp, resource, params))
+        if _key_func is get_remote_addr:
+            # the default key_func - inlined, so it doesn't cost a function call on every request
+            _key = f"{self._key_prefix}{req.remote_addr}"
         else:
-            _key = str(_key_func(req, resp, resource, params))
-        logger.debug(f" Key to be used: {_key}")
+            _key = f"{self._key_prefix}{_key_func(req, resp, resource, params)}"
+        logger.debug(" Key to be used: %s", _key)
+        req.context.ratelimit_key = _key
 
-        # if 'deduct_when' is set, then we will need the key later in the process_response():
+        # if 'deduct_when' is set, then we will need the limit settings later in the process_response(),
+        # so it doesn't need to look them up again - the key is already on the req.context and the
+        # limits only need to be stored separately when they were built by dynamic_limits for this request:
         if _deduct_when:
-            req.context.ratelimit_key = _key
+            req.context._fl_meta = meta
+            if _dynamic_limits:
+                req.context._fl_limits = _parsed_limits
 
         # Are we hitting (eg testing+incrementing) or just testing the limit?
         # When there is a 'deduct_when' then we are only testing here and
         # we will be hitting (eg incrementing) in the process_response()
-        _hit_or_test = self.limiter.limiter.test if _deduct_when else self.limiter.limiter.hit
-
-        # hit/test each limit
-        for _limit in _parsed_limits:
-            # hit/test the given limit for the given key and error out if failing
-            # https://limits.readthedocs.io/en/stable/api.html#limits.strategies.RateLimiter.hit
-            if not _hit_or_test(_limit, _key):
-                logger.debug(f" Reached allowed limit '{_limit}' for key '{_key}'")
-                resp.status = HTTP_429
-                # outputing message: "Reached allowed allowed limit 5 hits per 1 minute!"
-                raise HTTPTooManyRequests(f"Reached allowed limit {str(_limit).replace(' per ', ' hits per ')}!")
-
-    def process_response(self, req, resp, resource, req_succeeded):
+        _hit_or_test = self._test if _deduct_when else self._hit
+
+        _failed_limit = None
+        _reject_cache = self.limiter.reject_cache
+        if _reject_cache is not None:
+            # was this key rejected recently by any of the limits, whose window has not reset yet?
+            _failed_limit = next((_limit for _limit in _parsed_limits if (_limit, _key) in _reject_cache), None)
+
+        if _failed_limit is None:
+            # hit/test each limit
+            for _limit in _parsed_limits:
+                # hit/test the given limit for the given key and stop at the first failing one
+                # https://limits.readthedocs.io/en/stable/api.html#limits.strategies.RateLimiter.hit
+                if not _hit_or_test(_limit, _key):
+                    _failed_limit = _limit
+                    break
+
+            if _failed_limit is not None and _reject_cache is not None:
+                # remember the rejection until the window of the limit resets
+                _window_stats = self.limiter.limiter.get_window_stats(_failed_limit, _key)
+                _reject_cache.add((_failed_limit, _key), _window_stats[0])
+
+        if _failed_limit is not None:
+            logger.debug(" Reached allowed limit '%s' for key '%s'", _failed_limit, _key)
+            resp.status = HTTP_429
+            # outputing message: "Reached allowed limit 5 hits per 1 minute!"
+            raise HTTPTooManyRequests(_limit_message(_failed_limit))
+
+    def process_response(self, req: 'Request', resp: 'Response', resource: Any,
+                         req_succeeded: bool) -> None:
         """ Hit the limit after the response was processed if the 'deduct_when' is set,
         as that requires information about the response before it can determine whether this
         request should be counted against the limit
@@ -172,26 +300,58 @@ class Middleware:
         # when there is a 'deduct_when' then we were only testing the limit in process_resource() and
         # actually NOT hitting (incrementing) the counters. Here in the response we need to increment
         # the counters now by actually "hitting" the limits.
-        if hasattr(resource, f'_{req.method}_deduct_when') and getattr(resource, f'_{req.method}_deduct_when'):
+        meta = getattr(req.context, '_fl_meta', None)
+        if meta is None:
+            return
+
+        # if the deduct_when function returns True, then we hit the limits to increment their counters
+        if meta.deduct_when(req, resp, resource, req_succeeded):
             _key = req.context.ratelimit_key
-            _deduct_when = getattr(resource, f'_{req.method}_deduct_when')
+            _parsed_limits = req.context._fl_limits if meta.dynamic_limits else meta.parsed_limits
+            # hit each limit
+            for _limit in _parsed_limits:
+                # hit the given limit for the given key - but we don't care about the result,
+                # as we only use it to increment their counters
+                self._hit(_limit, _key)
+
+    def _get_limit_meta(self, resource, method: str) -> Optional[LimitMeta]:
+        """ Determines whether the responder of the given resource and HTTP method has a limit setup
+        and if yes, then returns the limits, the parsed limits, the key_func, the deduct_when and
+        the dynamic_limits to be used for it - otherwise returns None
+        """
+        # find out which responder ("on_..." method) is going to be used to process this request
+        responder = _get_responders(type(resource)).get(method)
+        if not responder:
+            return None
+        responder_fn = getattr(resource, responder)
+
+        # is the given method (or its class) decorated by 'limit'? see the "Limiter.limit" decorator
+        # in limiter.py - when 'limit' is not the topmost decorator, then @register(decor1, decor2)
+        # hoists its arguments onto the topmost one, see register() in utils.py
+        spec = getattr(responder_fn, '_limit_spec', None)
+        if spec is None:
+            # no limit was requested on this responder
+            logger.debug(" No 'limit' was requested for this endpoint.")
+            return None
+
+        logger.debug(" This endpoint is decorated with a limit")
+
+        # the limits (or the default limits) were already resolved and parsed at decoration time
+        _limits = spec.limits
+        _parsed_limits = spec.parsed_limits
+        logger.debug(" The limits parsed into RateLimitItem object(s) are: %s", _parsed_limits)
 
-            # if the deduct_when function returns True, then we hit the limits to increment their counters
-            if _deduct_when(req, resp, resource, req_succeeded):
-                # hit each limit
-                for _limit in getattr(resource, f'_{req.method}_parsed_limits'):
-                    # hit the given limit for the given key - but we don't care about the result,
-                    # as we only use it to increment their counters
-                    self.limiter.limiter.hit(_limit, _key)
+        return LimitMeta(
+            limits=_limits,
+            parsed_limits=_parsed_limits,
+            key_func=spec.key_func or self.limiter.key_func,
+            deduct_when=spec.deduct_when or self.limiter.default_deduct_when,
+            dynamic_limits=spec.dynamic_limits or self.limiter.default_dynamic_limits)
 
     @staticmethod
-    def parse_limits(limits: Union[str, Iterable[str]]) -> List['RateLimitItem']:
+    def parse_limits(limits: Union[str, Iterable[str]]) -> Tuple['RateLimitItem', ...]:
         """ Takes a string of limits (eg '5 per minute,2 per second') or an iterable
         of limits (eg ['5 per minute', '2 per second']) and sends each to be parsed into
-        a proper rule and returns a List of these parsed rules.
+        a proper rule and returns a tuple of these parsed rules.
         """
-        # _limits might be an iterable - in which case we need to turn it into a string
-        if not isinstance(limits, str):
-            # 'limits' is an iterable
-            limits = ';'.join(limits)
-        return [parse_limits(l.strip()) for l in re.split(';|,', limits)]
+        return _parse_limits(limits)
@@ -38,8 +38,14 @@ def register(*decorators):
         >> ['many', 'decos', 'here']
     """
     def register_wrapper(func):
-        for deco in decorators[::-1]:
+        for deco in reversed(decorators):
             func = deco(func)
         func._decorators = decorators
+        # hoist the arguments of the limit() decorator onto the outermost wrapper, so the middleware
+        # finds them with a single lookup - the same way as when limit() is the topmost decorator
+        if not hasattr(func, '_limit_spec'):
+            spec = next((d._limit_spec for d in decorators if hasattr(d, '_limit_spec')), None)
+            if spec is not None:
+                func._limit_spec = spec
         return func
     return register_wrapper
@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from falcon import asgi, testing
+
+
+class AsgiClient:
+    """ A minimal replacement of the testing.TestClient for ASGI apps, which runs all the simulated
+    requests on the same event loop through an ASGIConductor
+
+    Only the simulate_*() methods used by the tests are provided.
+    """
+
+    def __init__(self, app, loop):
+        self.app = app
+        self._conductor = testing.ASGIConductor(app)
+        self._loop = loop
+
+    def simulate_request(self, *args, **kwargs) -> testing.Result:
+        return self._loop.run_until_complete(self._conductor.simulate_request(*args, **kwargs))
+
+    def simulate_get(self, path='/', **kwargs) -> testing.Result:
+        return self.simulate_request('GET', path, **kwargs)
+
+    def simulate_post(self, path='/', **kwargs) -> testing.Result:
+        return self.simulate_request('POST', path, **kwargs)
+
+    def simulate_put(self, path='/', **kwargs) -> testing.Result:
+        return self.simulate_request('PUT', path, **kwargs)
+
+
+@pytest.fixture(scope='session')
+def asgi_loop():
+    """ The event loop shared by all the ASGI tests
+
+    It is also set as the current event loop, so the testing.TestClient and falcon's
+    async_to_sync() pick up the same loop instead of creating their own.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+@pytest.fixture
+def asgi_client(asgi_loop):
+    """ Returns a factory which creates an AsgiClient for the given app, running on the shared event loop
+    """
+    def create_client(app):
+        return AsgiClient(app, asgi_loop)
+    return create_client
+
+
+@pytest.fixture()
+def asyncclient(asyncapp, asgi_client):
+    """ Creates an AsgiClient for the app of the asyncapp fixture
+    """
+    return asgi_client(asyncapp)
+
+
+@pytest.fixture()
+def asyncapp_factory(asynclimiter, asgi_client):
+    """ Returns a function which adds the given resource to a new Falcon ASGI app using the limiter and
+    returns an AsgiClient for it
+    """
+    def make(resource, path='/things'):
+        app = asgi.App(middleware=asynclimiter.middleware)
+        app.add_route(path, resource)
+        return asgi_client(app)
+    return make
@@ -1,12 +1,13 @@
 """ Testing the deduct_when option
 """
-from falcon import asgi, testing, HTTP_200, HTTP_429, HTTP_500
+from falcon import async_to_sync, asgi, HTTP_200, HTTP_500
 from falcon_limiter import AsyncLimiter
 from falcon_limiter.utils import get_remote_addr
-from time import sleep
+from tests.conftest import _HELLO
+from limits import parse
 
 
-def test_deduct_when_http200_as_default_deduct():
+def test_deduct_when_http200_as_default_deduct(frozen_clock, asgi_client):
     """ Test using the default_deduct_when option to deduct only when the response is 200
     """
 
@@ -19,34 +20,34 @@ def test_deduct_when_http200_as_default_deduct():
     @limiter.limit()
     class ThingsResource:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         async def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
             resp.status = HTTP_500
 
     app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
 
     # this is a 500 response, so it should NOT count!
     r = client.simulate_post('/things')
-    assert r.status == HTTP_500
+    assert r.status_code == 500
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_deduct_when_http200_as_class_decorator():
+def test_deduct_when_http200_as_class_decorator(frozen_clock, asgi_client):
     """ Test using the deduct_when option on a class decorator to deduct only when the response is 200
     """
 
@@ -58,35 +59,35 @@ def test_deduct_when_http200_as_class_decorator():
     @limiter.limit(deduct_when=lambda req, resp, resource, req_succeeded: resp.status == HTTP_200)
     class ThingsResource:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         async def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
             resp.status = HTTP_500
 
     app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
 
     # this is a 500 response, so it should NOT count!
     r = client.simulate_post('/things')
-    assert r.status == HTTP_500
+    assert r.status_code == 500
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
 
-def test_deduct_when_http200_as_method_decorator():
+def test_deduct_when_http200_as_method_decorator(frozen_clock, asgi_client):
     """ Test using the deduct_when option on a method decorator to deduct only when the response is 200
     """
 
@@ -98,29 +99,104 @@ def test_deduct_when_http200_as_method_decorator():
     @limiter.limit(deduct_when=lambda req, resp, resource, req_succeeded: resp.status == HTTP_200)
     class ThingsResource:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         @limiter.limit()
         async def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
             resp.status = HTTP_500
 
     app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
 
     # this is a 500 response, so it should NOT count!
     r = client.simulate_post('/things')
-    assert r.status == HTTP_500
+    assert r.status_code == 500
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
+
+
+def test_deduct_when_with_dynamic_limits(asgi_client):
+    """ Test using the deduct_when option together with dynamic_limits, where the limits
+    to be hit in the response are the ones built dynamically for the given request
+    """
+
+    limiter = AsyncLimiter(
+        key_func=get_remote_addr,
+        default_deduct_when=lambda req, resp, resource, req_succeeded: resp.status == HTTP_200,
+        default_dynamic_limits=lambda req, resp, resource, req_succeeded: '1/second'
+    )
+
+    @limiter.limit()
+    class ThingsResource:
+        async def on_get(self, req, resp):
+            resp.data = _HELLO
+
+        async def on_post(self, req, resp):
+            resp.data = _HELLO
+            resp.status = HTTP_500
+
+    app = asgi.App(middleware=limiter.middleware)
+    app.add_route('/things', ThingsResource())
+
+    client = asgi_client(app)
+
+    # this is a 500 response, so it should NOT count!
+    r = client.simulate_post('/things')
+    assert r.status_code == 500
+
+    r = client.simulate_get('/things')
+    assert r.status_code == 200
+
+    # due to the 1/second dynamic limit
+    r = client.simulate_get('/things')
+    assert r.status_code == 429
+
+
+def test_deduct_when_concurrent_tests(asgi_client):
+    """ Test the limits being tested and hit concurrently when 'deduct_when' is set,
+    which is done for remote storage backends (eg Redis) only
+    """
+
+    limiter = AsyncLimiter(
+        key_func=get_remote_addr,
+        default_limits=["10 per hour", "1 per second"],
+        default_deduct_when=lambda req, resp, resource, req_succeeded: resp.status == HTTP_200
+    )
+
+    @limiter.limit()
+    class ThingsResource:
+        async def on_get(self, req, resp):
+            resp.data = _HELLO
+
+    middleware = limiter.middleware
+    # force the concurrent testing and hitting, as the limiter uses the memory storage
+    middleware._concurrent = True
+
+    app = asgi.App(middleware=middleware)
+    app.add_route('/things', ThingsResource())
+
+    client = asgi_client(app)
+
+    r = client.simulate_get('/things')
+    assert r.status_code == 200
+
+    # due to the 1 second default limit on the default limiter
+    r = client.simulate_get('/things')
+    assert r.status_code == 429
+    assert r.json['title'] == 'Reached allowed limit 1 hits per 1 second!'
+
+    # both limits were hit by the first request
+    for limit in (parse("10 per hour"), parse("1 per second")):
+        assert async_to_sync(limiter.limiter.get_window_stats, limit, '127.0.0.1')[1] == limit.amount - 1
@@ -1,12 +1,12 @@
 """ Testing the dynamic_limits option
 """
-from falcon import asgi, testing, HTTP_200, HTTP_429, HTTP_500
+from falcon import asgi
 from falcon_limiter import AsyncLimiter
 from falcon_limiter.utils import get_remote_addr
-from time import sleep
+from tests.conftest import _HELLO, fast_get
 
 
-def test_default_dynamic_limits():
+def test_default_dynamic_limits(frozen_clock, asgi_client):
     """ Test using the default_dynamic_limits option to change the limit per user
     """
 
@@ -19,41 +19,40 @@ def test_default_dynamic_limits():
     @limiter.limit()
     class ThingsResource:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
 
     ####
     # 'normal' user - errors after more than 2 calls per sec
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 2/second limit
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     #########
     # 'admin' user should be able to make 5 calls
     admin_header = {"APIUSER": "admin"}
     for i in range(5):
-        r = client.simulate_get('/things', headers=admin_header)
-        assert r.status == HTTP_200
+        assert fast_get(app, '/things', headers=admin_header) == 200
 
     # at the 6th hit even the admin user will error:
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_dynamic_limits_on_method():
+def test_dynamic_limits_on_method(frozen_clock, asgi_client):
     """ Test using the dynamic_limits param of the method decorators to change the limit per user
     """
 
@@ -66,50 +65,49 @@ def test_dynamic_limits_on_method():
         @limiter.limit(dynamic_limits=lambda req, resp, resource, req_succeeded: '5/second'
             if req.get_header('APIUSER') == 'admin' else '2/second')
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         async def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
 
     ####
     # 'normal' user - errors after more than 2 calls per sec
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 2/second limit
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     #########
     # 'admin' user should be able to make 5 calls
     admin_header = {"APIUSER": "admin"}
     for i in range(5):
-        r = client.simulate_get('/things', headers=admin_header)
-        assert r.status == HTTP_200
+        assert fast_get(app, '/things', headers=admin_header) == 200
 
     # at the 6th hit even the admin user will error:
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     ########
     # unlimited number of calls to the unlimited on_post() method
     for i in range(8):
         r = client.simulate_post('/things')
-        assert r.status == HTTP_200
+        assert r.status_code == 200
 
 
-def test_dynamic_limits_on_method2():
+def test_dynamic_limits_on_method2(frozen_clock, asgi_client):
     """ Test using the dynamic_limits param of the method decorators to change the limit per user
 
     Overwriting the default limits from the method level decorator
@@ -125,44 +123,43 @@ def test_dynamic_limits_on_method2():
     class ThingsResource:
         @limiter.limit()
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         async def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
 
     ####
     # 'normal' user - errors after more than 2 calls per sec
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 2/second limit
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     #########
     # 'admin' user should be able to make 5 calls
     admin_header = {"APIUSER": "admin"}
     for i in range(5):
-        r = client.simulate_get('/things', headers=admin_header)
-        assert r.status == HTTP_200
+        assert fast_get(app, '/things', headers=admin_header) == 200
 
     # at the 6th hit even the admin user will error:
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_dynamic_limits_on_class():
+def test_dynamic_limits_on_class(frozen_clock, asgi_client):
     """ Test using the dynamic_limits param of the decorators to change the limit per user
     """
 
@@ -175,58 +172,57 @@ def test_dynamic_limits_on_class():
         @limiter.limit(dynamic_limits=lambda req, resp, resource, req_succeeded: '5/second'
             if req.get_header('APIUSER') == 'admin' else '2/second')
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         @limiter.limit(limits="3/second")
         async def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
 
     ####
     # 'normal' user - errors after more than 2 calls per sec
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 2/second limit
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     #########
     # 'admin' user should be able to make 5 calls
     admin_header = {"APIUSER": "admin"}
     for i in range(5):
-        r = client.simulate_get('/things', headers=admin_header)
-        assert r.status == HTTP_200
+        assert fast_get(app, '/things', headers=admin_header) == 200
 
     # at the 6th hit even the admin user will error:
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     ########
     # the on_post() method has a limit of 3/second - for normal users
     for i in range(3):
         r = client.simulate_post('/things')
-        assert r.status == HTTP_200
+        assert r.status_code == 200
 
     r = client.simulate_post('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     ########
     # the on_post() method has a limit of 3/second - for admin users too
-    sleep(1)
+    frozen_clock.tick(1.01)
     for i in range(3):
         r = client.simulate_post('/things', headers=admin_header)
-        assert r.status == HTTP_200
+        assert r.status_code == 200
 
     r = client.simulate_post('/things', headers=admin_header)
-    assert r.status == HTTP_429
+    assert r.status_code == 429
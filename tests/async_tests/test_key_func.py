@@ -1,13 +1,13 @@
 """ Tests with different key_func
 """
-from falcon import asgi, testing, HTTP_200, HTTP_429
+from falcon import asgi
 from falcon_limiter import AsyncLimiter
 from falcon_limiter.utils import get_remote_addr
+from tests.conftest import _HELLO, apply_limit
 import pytest
-from time import sleep
 
 
-def test_get_remote_addr():
+def test_get_remote_addr(frozen_clock, asgi_client):
     """ Test using the get_remote_addr() key function as default
     """
 
@@ -16,28 +16,25 @@ def test_get_remote_addr():
         default_limits=["10 per hour", "1 per second"]
     )
 
-    @limiter.limit()
-    class ThingsResource:
-        async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+    ThingsResource = apply_limit(limiter)
 
     app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_reverse_proxies():
+def test_reverse_proxies(asgi_client):
     """ Test using a custom key_func - one which you would use to handle reverse proxies
     """
 
@@ -51,10 +48,7 @@ def test_reverse_proxies():
         default_limits=["10 per hour", "1 per second"]
     )
 
-    @limiter.limit()
-    class ThingsResource:
-        async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+    ThingsResource = apply_limit(limiter)
 
     # two different source IPs through 1 reverse proxy:
     ip1_header = {"X-FORWARDED-FOR": "10.0.0.1, 1.2.3.4"}
@@ -63,20 +57,20 @@ def test_reverse_proxies():
     app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
     r = client.simulate_get('/things', headers=ip1_header)
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # the same IP is denied
     r = client.simulate_get('/things', headers=ip1_header)
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     # but a different IP can still access it
     r = client.simulate_get('/things', headers=ip2_header)
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_limit_by_resource_and_method():
+def test_limit_by_resource_and_method(asgi_client):
     """ Test using a custom key_func - one which creates different buckets by resource and method
     """
 
@@ -89,32 +83,26 @@ def test_limit_by_resource_and_method():
         default_limits=["10 per hour", "1 per second"]
     )
 
-    @limiter.limit()
-    class ThingsResource:
-        async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
-
-        async def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+    ThingsResource = apply_limit(limiter)
 
     app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     # but a different endpoint can still be hit
     r = client.simulate_post('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
 # We can't test this anymore, as errors raised in the key no longer
 # catchable by the response
-# def test_key_func_in_class_decorator():
+# def test_key_func_in_class_decorator(asgi_client):
 #     """ Test using the key_func parameter in the decorator
 #     """
 #
@@ -130,12 +118,12 @@ def test_limit_by_resource_and_method():
 #     @limiter.limit(key_func=get_key)
 #     class ThingsResource:
 #         def on_get(self, req, resp):
-#             resp.body = 'Hello world!'
+#             resp.data = _HELLO
 #
 #     app = API(middleware=limiter.middleware)
 #     app.add_route('/things', ThingsResource())
 #
-#     client = testing.TestClient(app)
+#     client = asgi_client(app)
 #
 #     # our customer 'get_key' function gets called, which throws an error:
 #     with pytest.raises(ValueError):
@@ -144,7 +132,7 @@ def test_limit_by_resource_and_method():
 
 # We can't test this anymore, as errors raised in the key no longer
 # catchable by the response
-# def test_key_func_in_method_decorator():
+# def test_key_func_in_method_decorator(asgi_client):
 #     """ Test using the key_func parameter in the decorator
 #     """
 #
@@ -161,12 +149,12 @@ def test_limit_by_resource_and_method():
 #     class ThingsResource:
 #         @limiter.limit(limits="1 per minute", key_func=get_key)
 #         def on_get(self, req, resp):
-#             resp.body = 'Hello world!'
+#             resp.data = _HELLO
 #
 #     app = API(middleware=limiter.middleware)
 #     app.add_route('/things', ThingsResource())
 #
-#     client = testing.TestClient(app)
+#     client = asgi_client(app)
 #
 #     # our customer 'get_key' function gets called, which throws an error:
 #     with pytest.raises(ValueError):
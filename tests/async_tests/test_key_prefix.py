@@ -1,12 +1,12 @@
 """ Tests the use of the key_prefix
 """
-from falcon import asgi, testing, HTTP_200, HTTP_429
+from falcon import asgi
 from falcon_limiter import AsyncLimiter
 from falcon_limiter.utils import get_remote_addr
-from time import sleep
+from tests.conftest import apply_limit
 
 
-def test_different_key_prefixes():
+def test_different_key_prefixes(asgi_client):
     """ Test using different key_prefixes
     """
 
@@ -18,21 +18,18 @@ def test_different_key_prefixes():
         }
     )
 
-    @limiter1.limit()
-    class ThingsResource:
-        async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+    ThingsResource = apply_limit(limiter1)
 
     app1 = asgi.App(middleware=limiter1.middleware)
     app1.add_route('/things', ThingsResource())
 
-    client1 = testing.TestClient(app1)
+    client1 = asgi_client(app1)
     r = client1.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client1.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
 
     #####
@@ -46,18 +43,15 @@ def test_different_key_prefixes():
         }
     )
 
-    @limiter2.limit()
-    class ThingsResource:
-        async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+    ThingsResource = apply_limit(limiter2)
 
     app2 = asgi.App(middleware=limiter2.middleware)
     app2.add_route('/things', ThingsResource())
 
-    client2 = testing.TestClient(app2)
+    client2 = asgi_client(app2)
     r = client2.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client2.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
@@ -1,358 +1,445 @@
 """ Test the different scenarios of limiter.py
 """
-from falcon import asgi, testing, HTTP_200, HTTP_429, HTTP_405
+import asyncio
+import pytest
+from falcon import async_to_sync, asgi, testing
 from falcon_limiter import AsyncLimiter
 from falcon_limiter.utils import get_remote_addr
-from time import sleep
+from limits.storage import storage_from_string
+from tests.conftest import _HELLO, default_strategy_only
 
 
-def test_default_limit(asynclimiter):
+def test_default_limit(asynclimiter, asyncapp_factory, frozen_clock):
     """ Test the default limit applied through the class decorator
     """
     @asynclimiter.limit()
     class ThingsResource:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         async def some_other_method(self):
             pass
 
-    app = asgi.App(middleware=asynclimiter.middleware)
-    app.add_route('/things', ThingsResource())
-
-    client = testing.TestClient(app)
+    client = asyncapp_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_no_limit(asynclimiter):
+def test_no_limit(asynclimiter, frozen_clock, asgi_client):
     """ Test a no limit resource even when another resource has a limit
     """
     @asynclimiter.limit()
     class ThingsResource:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     class ThingsResourceNoLimit:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     app = asgi.App(middleware=asynclimiter.middleware)
     app.add_route('/things', ThingsResource())
     app.add_route('/thingsnolimit', ThingsResourceNoLimit())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
-    for i in range(3):
-        r = client.simulate_get('/thingsnolimit')
-        assert r.status == HTTP_200
+    r = client.simulate_get('/thingsnolimit')
+    assert r.status_code == 200
 
 
-def test_limit_on_method(asynclimiter):
+@default_strategy_only('asynclimiter')
+@pytest.mark.parametrize("i", range(3))
+def test_no_limit_repeat(i, asyncclient):
+    """ Test the i-th repeated call of a no limit resource, while the other resource is over its limit
+    """
+    asyncclient.simulate_get('/things')
+    assert asyncclient.simulate_get('/things').status_code == 429
+
+    for _ in range(i):
+        asyncclient.simulate_get('/thingsnolimit')
+    assert asyncclient.simulate_get('/thingsnolimit').status_code == 200
+
+
+def test_limit_on_method(asynclimiter, asyncapp_factory, frozen_clock):
     """ Test the limit decorator on the method
     """
     class ThingsResource:
         @asynclimiter.limit()
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
-
-    app = asgi.App(middleware=asynclimiter.middleware)
-    app.add_route('/things', ThingsResource())
+            resp.data = _HELLO
 
-    client = testing.TestClient(app)
+    client = asyncapp_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_limit_on_method_overwrite(asynclimiter):
+def test_limit_on_method_overwrite(asynclimiter, asyncapp_factory, frozen_clock):
     """ Test the limit decorator on the method overwriting the default limit
     """
     class ThingsResource:
         # the default limit on 'limiter' is 1 per second
         @asynclimiter.limit(limits="2 per second")
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
-
-    app = asgi.App(middleware=asynclimiter.middleware)
-    app.add_route('/things', ThingsResource())
+            resp.data = _HELLO
 
-    client = testing.TestClient(app)
+    client = asyncapp_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_limit_on_method_overwrite_multiple(asynclimiter):
-    """ Test the limit decorator on the method overwriting the default limit
-    with a combined limit
+@pytest.mark.parametrize("limits_arg", [
+    "5 per hour;2 per second",
+    "5 per hour;2/second",
+    ["5 per hour", "2 per second"],
+    "5 per hour,2 per second",
+], ids=["semicolon", "short_notation", "iterable", "comma"])
+def test_limits_forms(limits_arg, asynclimiter, asyncapp_factory, frozen_clock):
+    """ Test the limit decorator on the method overwriting the default limit with a combined limit,
+    provided in the different forms accepted
     """
     class ThingsResource:
         # the default limit on 'limiter' is 1 per second
-        @asynclimiter.limit(limits="5 per hour;2 per second")
+        @asynclimiter.limit(limits=limits_arg)
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = asgi.App(middleware=asynclimiter.middleware)
-    app.add_route('/things', ThingsResource())
-
-    client = testing.TestClient(app)
+    client = asyncapp_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_limit_on_method_overwrite_multiple_short_notation(asynclimiter):
-    """ Test the limit decorator on the method overwriting the default limit
-    with a combined limit
+def test_limit_class(asynclimiter, asyncapp_factory, frozen_clock):
+    """ Class level decorator overwriting the default
     """
+    # the default limit on 'limiter' is 1 per second
+    @asynclimiter.limit(limits="5 per hour;2 per second")
     class ThingsResource:
-        # the default limit on 'limiter' is 1 per second
-        @asynclimiter.limit(limits="5 per hour;2/second")
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
-
-    app = asgi.App(middleware=asynclimiter.middleware)
-    app.add_route('/things', ThingsResource())
+            resp.data = _HELLO
 
-    client = testing.TestClient(app)
+    client = asyncapp_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_limit_as_iterable(asynclimiter):
-    """ The limit might be provided as an iterable
+def test_limit_class_and_method(asynclimiter, asyncapp_factory, frozen_clock):
+    """ Class level decorator overwrites the method level one
+
+    IMPORTANT - this is different from the sync version of the limiter,
+    where the class level decorator gets overwritten by the method level one
     """
+    # also the limits are in an unusual order:
+    @asynclimiter.limit(limits="3 per second;5 per hour")
     class ThingsResource:
         # the default limit on 'limiter' is 1 per second
-        @asynclimiter.limit(limits=["5 per hour", "2 per second"])
+        @asynclimiter.limit(limits="5 per hour;2 per second")
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
-
-    app = asgi.App(middleware=asynclimiter.middleware)
-    app.add_route('/things', ThingsResource())
+            resp.data = _HELLO
 
-    client = testing.TestClient(app)
+    client = asyncapp_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 200
 
-    sleep(1)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
-
+    assert r.status_code == 429
 
-def test_limit_w_commas(asynclimiter):
-    """ The limit might be provided comma-separated
-    """
-    class ThingsResource:
-        # the default limit on 'limiter' is 1 per second
-        @asynclimiter.limit(limits="5 per hour,2 per second")
-        async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
-
-    app = asgi.App(middleware=asynclimiter.middleware)
-    app.add_route('/things', ThingsResource())
+    # a rejected request is not counted against the 5 per hour limit, so 2 more requests are allowed
+    # after the second-window resets - 2 seconds, so the previous window is past for every strategy
+    frozen_clock.tick(2.01)
+    r = client.simulate_get('/things')
+    assert r.status_code == 200
 
-    client = testing.TestClient(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
+    # due to the 5 per hour limit
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 429
+    assert r.json['title'] == 'Reached allowed limit 5 hits per 1 hour!'
 
+    frozen_clock.tick(2.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    # the hour-window resets too
+    frozen_clock.tick(2 * 3600)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_limit_w_semicol(asynclimiter):
-    """ The limit might be provided semicol-separated
+def test_empy_limits(asgi_client):
+    """ Test incorrect setup - empty limits!
+
+    In this case there are NO limits applied
     """
+
+    limiter = AsyncLimiter(
+        key_func=get_remote_addr
+    )
+
+    @limiter.limit()
     class ThingsResource:
-        # the default limit on 'limiter' is 1 per second
-        @asynclimiter.limit(limits="5 per hour;2 per second")
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = asgi.App(middleware=asynclimiter.middleware)
+    app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    client = asgi_client(app)
+    for i in range(5):
+        r = client.simulate_get('/things')
+        assert r.status_code == 200
 
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
 
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+@default_strategy_only('asynclimiter')
+def test_undefined_endpointasync(asynclimiter, asyncapp_factory):
+    """ Test calling a method which is not defined at all
 
-    sleep(1)
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    Our module should not error, but we should leave it to Falcon to handle it - and return a 405.
+    """
+    @asynclimiter.limit()
+    class ThingsResource:
+        async def on_get(self, req, resp):
+            resp.data = _HELLO
 
+    client = asyncapp_factory(ThingsResource())
+    r = client.simulate_post('/things')
+    assert r.status_code == 405
 
-def test_limit_class(asynclimiter):
-    """ Class level decorator overwriting the default
+
+def test_shared_storage(asgi_client):
+    """ Test passing an already built storage in the 'RATELIMIT_STORAGE' config, shared by two limiters
     """
-    # the default limit on 'limiter' is 1 per second
-    @asynclimiter.limit(limits="5 per hour;2 per second")
+    storage = storage_from_string('async+memory://')
+    limiter1 = AsyncLimiter(default_limits="1 per second", config={'RATELIMIT_STORAGE': storage})
+    limiter2 = AsyncLimiter(default_limits="1 per second", config={'RATELIMIT_STORAGE': storage})
+    assert limiter1.storage is limiter2.storage is storage
+
+    @limiter1.limit()
     class ThingsResource:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = asgi.App(middleware=asynclimiter.middleware)
+    client1 = asgi_client(asgi.App(middleware=limiter1.middleware))
+    client1.app.add_route('/things', ThingsResource())
+    client2 = asgi_client(asgi.App(middleware=limiter2.middleware))
+    client2.app.add_route('/things', ThingsResource())
+
+    r = client1.simulate_get('/things')
+    assert r.status_code == 200
+
+    # the hit is counted in the shared storage, so the other limiter rejects the same key too
+    r = client2.simulate_get('/things')
+    assert r.status_code == 429
+
+
+def test_reject_cache(monkeypatch, frozen_clock, asgi_client):
+    """ Test the 'RATELIMIT_REJECT_CACHE' config, where the rejected keys are remembered
+    until the window resets, so the storage doesn't need to be hit for them
+    """
+    limiter = AsyncLimiter(
+        key_func=get_remote_addr,
+        default_limits="1 per second",
+        config={'RATELIMIT_REJECT_CACHE': True}
+    )
+
+    @limiter.limit()
+    class ThingsResource:
+        async def on_get(self, req, resp):
+            resp.data = _HELLO
+
+    middleware = limiter.middleware
+    app = asgi.App(middleware=middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 429
+
+    # the rejection is served from the cache, without hitting the storage
+    hits = []
+    original_hit = middleware._hit
 
+    async def counting_hit(*args):
+        hits.append(args)
+        return await original_hit(*args)
+
+    monkeypatch.setattr(middleware, '_hit', counting_hit)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
+    assert not hits
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
+    assert len(hits) == 1
 
 
-def test_limit_class_and_method(asynclimiter):
-    """ Class level decorator overwrites the method level one
-
-    IMPORTANT - this is different from the sync version of the limiter,
-    where the class level decorator gets overwritten by the method level one
+def test_limit_class_shared_responder(asynclimiter, asgi_client):
+    """ The same function being the responder of two classes with different class level limits
     """
-    # also the limits are in an unusual order:
-    @asynclimiter.limit(limits="3 per second;5 per hour")
+    async def get_things(self, req, resp):
+        resp.data = _HELLO
+
+    @asynclimiter.limit(limits="1 per second")
     class ThingsResource:
-        # the default limit on 'limiter' is 1 per second
-        @asynclimiter.limit(limits="5 per hour;2 per second")
-        async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+        on_get = get_things
+
+    @asynclimiter.limit(limits="50 per second")
+    class OtherThingsResource:
+        on_get = get_things
 
     app = asgi.App(middleware=asynclimiter.middleware)
     app.add_route('/things', ThingsResource())
+    app.add_route('/otherthings', OtherThingsResource())
 
-    client = testing.TestClient(app)
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    client = asgi_client(app)
+    assert [client.simulate_get('/otherthings').status_code for _ in range(3)] == [200, 200, 200]
+    assert [client.simulate_get('/things').status_code for _ in range(3)] == [200, 429, 429]
 
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
 
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+def test_limit_class_inherited_method(asynclimiter, asgi_client):
+    """ Class level decorator on a subclass does not limit the methods of its parent class
+    """
+    class BaseResource:
+        async def on_get(self, req, resp):
+            resp.data = _HELLO
+
+    @asynclimiter.limit()
+    class ThingsResource(BaseResource):
+        pass
 
+    app = asgi.App(middleware=asynclimiter.middleware)
+    app.add_route('/things', ThingsResource())
+    app.add_route('/base', BaseResource())
+
+    client = asgi_client(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 200
 
-    sleep(1)
+    # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 429
 
+    for i in range(3):
+        r = client.simulate_get('/base')
+        assert r.status_code == 200
 
-def test_empy_limits():
-    """ Test incorrect setup - empty limits!
 
-    In this case there are NO limits applied
+def test_concurrent_requests(asynclimiter):
+    """ Concurrent requests of the same key do not get more hits through than the limit allows
     """
-
-    limiter = AsyncLimiter(
-        key_func=get_remote_addr
-    )
-
-    @limiter.limit()
+    @asynclimiter.limit(limits="3 per minute")
     class ThingsResource:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = asgi.App(middleware=limiter.middleware)
+    app = asgi.App(middleware=asynclimiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
-    for i in range(5):
-        r = client.simulate_get('/things')
-        assert r.status == HTTP_200
+    async def simulate_concurrent_gets():
+        async with testing.ASGIConductor(app) as conductor:
+            return await asyncio.gather(*[conductor.simulate_get('/things') for _ in range(10)])
 
+    results = async_to_sync(simulate_concurrent_gets)
+    assert [r.status_code for r in results].count(200) == 3
+    assert [r.status_code for r in results].count(429) == 7
 
-def test_undefined_endpointasync(asynclimiter):
-    """ Test calling a method which is not defined at all
 
-    Our module should not error, but we should leave it to Falcon to handle it - and return a 405.
+@default_strategy_only('fresh_asynclimiter')
+def test_finalize(fresh_asynclimiter, asgi_client):
+    """ Test resolving the limit settings of all the resources before the first request
     """
-    @asynclimiter.limit()
+    @fresh_asynclimiter.limit()
     class ThingsResource:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = asgi.App(middleware=asynclimiter.middleware)
+    class NoLimitResource:
+        async def on_get(self, req, resp, thing_id):
+            resp.data = _HELLO
+
+    app = asgi.App(middleware=fresh_asynclimiter.middleware)
     app.add_route('/things', ThingsResource())
+    app.add_route('/things/{thing_id}/nolimit', NoLimitResource())
+    fresh_asynclimiter.finalize(app)
 
-    client = testing.TestClient(app)
-    r = client.simulate_post('/things')
-    assert r.status == HTTP_405
+    assert fresh_asynclimiter.middleware._limit_meta[(ThingsResource, 'GET')].parsed_limits
+    assert fresh_asynclimiter.middleware._limit_meta[(NoLimitResource, 'GET')] is None
+
+    client = asgi_client(app)
+    r = client.simulate_get('/things')
+    assert r.status_code == 200
+
+    # due to the 1 second default limit on the default limiter
+    r = client.simulate_get('/things')
+    assert r.status_code == 429
+
+    for i in range(3):
+        r = client.simulate_get('/things/1/nolimit')
+        assert r.status_code == 200
@@ -2,14 +2,15 @@
 so strictly speaking we wouldn't need to test it - we are going to test Redis,
 our most popular backend
 """
-from falcon import asgi, testing, HTTP_200, HTTP_429
+from falcon import async_to_sync, asgi, HTTP_200
 from falcon_limiter import AsyncLimiter
 from falcon_limiter.utils import get_remote_addr
+from tests.conftest import _HELLO
+from limits import parse
 from time import sleep
-from tests.conftest import REDIS_PORT
 
 
-def test_redis(redis_server):
+def test_redis(async_redis_storage, redis_flush, asgi_client):
     """ Test using the redis backend
     """
 
@@ -18,26 +19,64 @@ def test_redis(redis_server):
         default_limits=["10 per hour", "1 per second"],
         config={
             'RATELIMIT_KEY_PREFIX': 'myapp',
-            'RATELIMIT_STORAGE_URL': f'async+redis://@localhost:{REDIS_PORT}'
+            'RATELIMIT_STORAGE': async_redis_storage
         }
     )
 
     @limiter.limit()
     class ThingsResource:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     app = asgi.App(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     sleep(1)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
+
+
+def test_redis_moving_window_deduct_when(async_redis_storage, redis_flush, asgi_client):
+    """ Test the limits being hit concurrently in the process_response() with the moving window
+    strategy on the redis backend - each limit has its own window, so none of the hits are lost
+    """
+
+    limiter = AsyncLimiter(
+        key_func=get_remote_addr,
+        default_limits=["10 per hour", "1 per second"],
+        default_deduct_when=lambda req, resp, resource, req_succeeded: resp.status == HTTP_200,
+        config={
+            'RATELIMIT_KEY_PREFIX': 'myapp',
+            'RATELIMIT_STRATEGY': 'moving-window',
+            'RATELIMIT_STORAGE': async_redis_storage
+        }
+    )
+    assert limiter.middleware._concurrent
+
+    @limiter.limit()
+    class ThingsResource:
+        async def on_get(self, req, resp):
+            resp.data = _HELLO
+
+    app = asgi.App(middleware=limiter.middleware)
+    app.add_route('/things', ThingsResource())
+
+    client = asgi_client(app)
+    r = client.simulate_get('/things')
+    assert r.status_code == 200
+
+    # due to the 1 second default limit on the default limiter
+    r = client.simulate_get('/things')
+    assert r.status_code == 429
+
+    # both limits were hit by the first request
+    for limit in (parse("10 per hour"), parse("1 per second")):
+        assert async_to_sync(limiter.limiter.get_window_stats, limit, 'myapp:127.0.0.1')[1] == limit.amount - 1
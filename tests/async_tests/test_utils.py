@@ -1,8 +1,10 @@
-from falcon import asgi, testing
+from falcon import asgi
 from falcon_limiter.utils import get_remote_addr
+from tests.conftest import _HELLO, default_strategy_only
 
 
-def test_get_remote_addr(asynclimiter):
+@default_strategy_only('asynclimiter')
+def test_get_remote_addr(asynclimiter, asgi_client):
     """ Test the utils.get_remote_addr() function which returns the requestor's ip
 
     Create an app with the default limiter and a method which is calling the get_remote_addr()
@@ -11,12 +13,12 @@ def test_get_remote_addr(asynclimiter):
     @asynclimiter.limit()
     class ThingsResource:
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
             assert '127.0.0.1' == get_remote_addr(req, resp, None, None)
 
     app = asgi.App(middleware=asynclimiter.middleware)
     things = ThingsResource()
     app.add_route('/things', things)
 
-    client = testing.TestClient(app)
+    client = asgi_client(app)
     client.simulate_get('/things')
@@ -0,0 +1,61 @@
+""" Microbenchmarks of the overhead of the AsyncLimiter's decorator, when combined with other decorators
+
+The arrangements are the ones of test_multiple_decorators_on_method() in
+tests/async_tests/test_multiple_decorators.py - the decorated responders are called directly,
+on the same event loop, so only the cost of the wrappers is measured.
+
+Run it from the root of the repo (requires pyperf):
+    PYTHONPATH=. python tests/bench_decorators.py -o bench_decorators.json
+"""
+import pyperf
+from falcon import asgi, testing
+from falcon_limiter import AsyncLimiter
+from falcon_limiter.utils import register
+from tests.conftest import _HELLO
+
+
+def async_decorator(f):
+    """ Just a random decorator for benchmarking purposes
+    """
+    async def wrapper(*args, **kwargs):
+        return await f(*args, **kwargs)
+    return wrapper
+
+
+limiter = AsyncLimiter(default_limits="1 per second")
+
+
+class ThingsResource:
+    # the @limiter decorator is the first decorator
+    @limiter.limit()
+    @async_decorator
+    async def on_get(self, req, resp):
+        resp.data = _HELLO
+
+    # the @limiter decorator is NOT the first and register() is not used
+    @async_decorator
+    @limiter.limit()
+    async def on_post(self, req, resp):
+        resp.data = _HELLO
+
+    # the decorators are registered via register()
+    @register(async_decorator, limiter.limit())
+    async def on_put(self, req, resp):
+        resp.data = _HELLO
+
+    # no decorators at all - the baseline
+    async def on_patch(self, req, resp):
+        resp.data = _HELLO
+
+
+if __name__ == '__main__':
+    runner = pyperf.Runner()
+
+    resource = ThingsResource()
+    req = testing.create_asgi_req()
+    resp = asgi.Response()
+
+    runner.bench_async_func('no_decorator', resource.on_patch, req, resp)
+    runner.bench_async_func('limit_first', resource.on_get, req, resp)
+    runner.bench_async_func('limit_second', resource.on_post, req, resp)
+    runner.bench_async_func('register', resource.on_put, req, resp)
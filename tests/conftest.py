@@ -1,9 +1,13 @@
 import errno
+import os
 import pytest
+import time
 
-from falcon import asgi, API, testing
+from falcon import async_to_sync, asgi, API, testing
 from falcon_limiter import Limiter, AsyncLimiter
 from falcon_limiter.utils import get_remote_addr
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES as LIMITS_STRATEGIES
 
 try:
     __import__("pytest_xprocess")
@@ -13,44 +17,208 @@ except ImportError:
     def xprocess():
         pytest.skip("pytest-xprocess not installed.")
 
-# the different strategies that will be tested
+# the body of the responses, already encoded
+_HELLO = b'Hello world!'
+
+# the different strategies that will be tested - the ones known by the installed version of 'limits'
 STRATEGIES = [
-    'fixed-window',
-    'fixed-window-elastic-expiry',
-    'moving-window'
+    strategy for strategy in (
+        'fixed-window',
+        'fixed-window-elastic-expiry',
+        'moving-window',
+        'sliding-window-counter'
+    ) if strategy in LIMITS_STRATEGIES
 ]
 
+# the pytest-xdist worker running the tests (eg 'gw0', or 'master' when not running in parallel),
+# so each worker can start its own Redis server
+XDIST_WORKER = os.environ.get('PYTEST_XDIST_WORKER', 'master')
+
 # which port the Redis server will be listening on
-# which is started by xprocess
-REDIS_PORT = 63799
+# which is started by xprocess - a different one for each xdist worker
+REDIS_PORT = 63799 + (int(XDIST_WORKER[2:]) + 1 if XDIST_WORKER.startswith('gw') else 0)
+
+
+# the WSGI environs / ASGI scopes built by fast_get(), keyed by the app type, path and headers
+_REQUESTS = {}
+
+
+def fast_get(app, path, headers=None):
+    """ Sends a GET request straight to the WSGI or ASGI app and returns the status code of the response
+    (eg 200) - for loops sending the same request over and over again
+
+    The WSGI environ / ASGI scope of the request is only built once, unlike with
+    the TestClient.simulate_get(), which builds a new one for every request.
+    """
+    is_asgi = isinstance(app, asgi.App)
+    key = (is_asgi, path, tuple(sorted(headers.items())) if headers else ())
+    if key not in _REQUESTS:
+        if is_asgi:
+            scope = testing.create_scope(path=path, headers=headers)
+            # the headers and the server of the scope are iterators, which could only be used once
+            scope['headers'] = [tuple(header) for header in scope['headers']]
+            scope['server'] = tuple(scope['server'])
+            _REQUESTS[key] = scope
+        else:
+            _REQUESTS[key] = testing.create_environ(path=path, headers=headers)
+
+    if is_asgi:
+        statuses = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(event):
+            if event['type'] == 'http.response.start':
+                statuses.append(event['status'])
+
+        async_to_sync(app, dict(_REQUESTS[key]), receive, send)
+        return statuses[0]
+
+    statuses = []
+    body = app(dict(_REQUESTS[key]), lambda status, headers, exc_info=None: statuses.append(status))
+    # consume the response, like a WSGI server would
+    for _ in body:
+        pass
+    return int(statuses[0][:3])
+
+
+class BaseThingsResource:
+    """ The plain resource shared by the tests, which only differ in the limiter applied to it
+    - see apply_limit()
+    """
+    def on_get(self, req, resp):
+        resp.data = _HELLO
+
+    def on_post(self, req, resp):
+        resp.data = _HELLO
+
+
+class AsyncBaseThingsResource:
+    """ The ASGI version of the BaseThingsResource
+    """
+    async def on_get(self, req, resp):
+        resp.data = _HELLO
+
+    async def on_post(self, req, resp):
+        resp.data = _HELLO
+
+
+def apply_limit(limiter, **kwargs):
+    """ Returns a new ThingsResource class decorated with limiter.limit(**kwargs)
+
+    The decorator is applied on a subclass of the (Async)BaseThingsResource, so the shared base class
+    itself is never changed.
+    """
+    base = AsyncBaseThingsResource if isinstance(limiter, AsyncLimiter) else BaseThingsResource
+    return limiter.limit(**kwargs)(type("ThingsResource", (base,), {}))
+
+
+class FakeClock:
+    """ A clock which only moves forward when it is told to, so the windows of the limits
+    can be rolled over without waiting for them
+    """
+    def __init__(self) -> None:
+        self.now = time.time()
+
+    def time(self) -> float:
+        return self.now
+
+    def tick(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture()
+def frozen_clock(monkeypatch):
+    """ Replaces the time.time() used by the (memory) storages with a FakeClock
+
+    Call frozen_clock.tick(1.01) instead of sleep(1) to move past a 1 second window.
+    """
+    clock = FakeClock()
+    monkeypatch.setattr(time, 'time', clock.time)
+    return clock
+
+
+def default_strategy_only(fixture_name):
+    """ Limits the given parametrized limiter fixture to the default 'fixed-window' strategy
+    - for the tests where the limiting strategy makes no difference
+    """
+    return pytest.mark.parametrize(fixture_name, ['fixed-window'], indirect=True)
+
+
+# the default limits of the limiters created by the fixtures
+DEFAULT_LIMITS = ("10 per hour", "1 per second")
+
+
+@pytest.fixture(scope="session")
+def limiter_factory():
+    """ Returns a function building (or returning the already built) limiter for a given
+    limiter class, strategy and default limits, so the limiters are shared by the whole session
+    """
+    limiters = {}
+
+    def factory(limiter_cls, strategy, default_limits=DEFAULT_LIMITS):
+        key = (limiter_cls, strategy, default_limits)
+        if key not in limiters:
+            limiters[key] = limiter_cls(
+                key_func=get_remote_addr,
+                default_limits=list(default_limits),
+                config={'RATELIMIT_STRATEGY': strategy}
+            )
+        return limiters[key]
+    return factory
+
+
+# parametrized fixture to provide limiters with different strategies
+@pytest.fixture(params=STRATEGIES)
+def limiter(request, limiter_factory):
+    """ Provides a basic limiter - shared with the other tests, but with its storage reset after the test
+    """
+    limiter = limiter_factory(Limiter, request.param)
+    yield limiter
+    limiter.storage.reset()
+
+
+# parametrized fixture to provide limiters with different strategies
+@pytest.fixture(params=STRATEGIES)
+def asynclimiter(request, limiter_factory):
+    """ Provides a basic limiter - shared with the other tests, but with its storage reset after the test
+    """
+    limiter = limiter_factory(AsyncLimiter, request.param)
+    yield limiter
+    async_to_sync(limiter.storage.reset)
 
 
 # parametrized fixture to create limiters with different strategies
 @pytest.fixture(params=STRATEGIES)
-def limiter(request):
-    """ Create a basic limiter
+def fresh_limiter(request):
+    """ Create a basic limiter, which is not shared with any other test
     """
     limiter = Limiter(
         key_func=get_remote_addr,
-        default_limits=["10 per hour", "1 per second"]
+        default_limits=list(DEFAULT_LIMITS),
+        config={'RATELIMIT_STRATEGY': request.param}
     )
     return limiter
 
 
 # parametrized fixture to create limiters with different strategies
 @pytest.fixture(params=STRATEGIES)
-def asynclimiter(request):
-    """ Create a basic limiter
+def fresh_asynclimiter(request):
+    """ Create a basic limiter, which is not shared with any other test
     """
     limiter = AsyncLimiter(
         key_func=get_remote_addr,
-        default_limits=["10 per hour", "1 per second"]
+        default_limits=list(DEFAULT_LIMITS),
+        config={'RATELIMIT_STRATEGY': request.param}
     )
     return limiter
 
 
-@pytest.fixture(scope="class")
+@pytest.fixture(scope="session")
 def redis_server(xprocess):
+    """ Starts the Redis server of the (xdist worker's) session - see redis_flush() for the tests using it
+    """
     try:
         import redis
     except ImportError:
@@ -61,7 +229,7 @@ def redis_server(xprocess):
         args = ["redis-server", "--port", REDIS_PORT]
 
     try:
-        xprocess.ensure("redis_server", Starter)
+        xprocess.ensure(f"redis_server_{XDIST_WORKER}", Starter)
     except IOError as e:
         # xprocess raises FileNotFoundError
         if e.errno == errno.ENOENT:
@@ -70,7 +238,30 @@ def redis_server(xprocess):
             raise
 
     yield
-    xprocess.getinfo("redis_server").terminate()
+    xprocess.getinfo(f"redis_server_{XDIST_WORKER}").terminate()
+
+
+@pytest.fixture()
+def redis_flush(redis_server):
+    """ Provides the Redis server shared by the session, with its database emptied before the test
+    """
+    import redis
+    redis.Redis(port=REDIS_PORT).flushdb()
+
+
+@pytest.fixture(scope="module")
+def redis_storage(redis_server):
+    """ A Redis storage shared by the tests of the module, so they reuse its connections
+    - pass it in the 'RATELIMIT_STORAGE' config
+    """
+    return storage_from_string(f'redis://@localhost:{REDIS_PORT}')
+
+
+@pytest.fixture(scope="module")
+def async_redis_storage(redis_server):
+    """ The async version of the redis_storage
+    """
+    return storage_from_string(f'async+redis://@localhost:{REDIS_PORT}')
 
 
 @pytest.fixture()
@@ -82,7 +273,7 @@ def app(request, limiter):
     class ThingsResource:
         # unmarked methods will use the default limit
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         # mark this method with a special limit
         # which will overwrite the default
@@ -117,7 +308,7 @@ def asyncapp(request, asynclimiter):
     class ThingsResource:
         # unmarked methods will use the default limit
         async def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         # mark this method with a special limit
         # which will overwrite the default
@@ -149,9 +340,14 @@ def client(app):
     return testing.TestClient(app)
 
 
+
 @pytest.fixture()
-def asyncclient(asyncapp):
-    """ Creates a Falcon test client
+def app_factory(limiter):
+    """ Returns a function which adds the given resource to a new Falcon app using the limiter and
+    returns a test client for it
     """
-    return testing.TestClient(asyncapp)
-
+    def make(resource, path='/things'):
+        app = API(middleware=limiter.middleware)
+        app.add_route(path, resource)
+        return testing.TestClient(app)
+    return make
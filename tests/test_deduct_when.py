@@ -1,12 +1,12 @@
 """ Testing the deduct_when option
 """
-from falcon import API, testing, HTTP_200, HTTP_429, HTTP_500
+from falcon import API, testing, HTTP_200, HTTP_500
 from falcon_limiter import Limiter
 from falcon_limiter.utils import get_remote_addr
-from time import sleep
+from tests.conftest import _HELLO
 
 
-def test_deduct_when_http200_as_default_deduct():
+def test_deduct_when_http200_as_default_deduct(frozen_clock):
     """ Test using the default_deduct_when option to deduct only when the response is 200
     """
 
@@ -19,10 +19,10 @@ def test_deduct_when_http200_as_default_deduct():
     @limiter.limit()
     class ThingsResource:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
             resp.status = HTTP_500
 
     app = API(middleware=limiter.middleware)
@@ -32,21 +32,21 @@ def test_deduct_when_http200_as_default_deduct():
 
     # this is a 500 response, so it should NOT count!
     r = client.simulate_post('/things')
-    assert r.status == HTTP_500
+    assert r.status_code == 500
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_deduct_when_http200_as_class_decorator():
+def test_deduct_when_http200_as_class_decorator(frozen_clock):
     """ Test using the deduct_when option on a class decorator to deduct only when the response is 200
     """
 
@@ -58,10 +58,10 @@ def test_deduct_when_http200_as_class_decorator():
     @limiter.limit(deduct_when=lambda req, resp, resource, req_succeeded: resp.status == HTTP_200)
     class ThingsResource:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
             resp.status = HTTP_500
 
     app = API(middleware=limiter.middleware)
@@ -71,22 +71,22 @@ def test_deduct_when_http200_as_class_decorator():
 
     # this is a 500 response, so it should NOT count!
     r = client.simulate_post('/things')
-    assert r.status == HTTP_500
+    assert r.status_code == 500
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
 
-def test_deduct_when_http200_as_method_decorator():
+def test_deduct_when_http200_as_method_decorator(frozen_clock):
     """ Test using the deduct_when option on a method decorator to deduct only when the response is 200
     """
 
@@ -98,11 +98,11 @@ def test_deduct_when_http200_as_method_decorator():
     @limiter.limit()
     class ThingsResource:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         @limiter.limit(deduct_when=lambda req, resp, resource, req_succeeded: resp.status == HTTP_200)
         def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
             resp.status = HTTP_500
 
     app = API(middleware=limiter.middleware)
@@ -112,15 +112,52 @@ def test_deduct_when_http200_as_method_decorator():
 
     # this is a 500 response, so it should NOT count!
     r = client.simulate_post('/things')
-    assert r.status == HTTP_500
+    assert r.status_code == 500
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
+
+
+def test_deduct_when_with_dynamic_limits():
+    """ Test using the deduct_when option together with dynamic_limits, where the limits
+    to be hit in the response are the ones built dynamically for the given request
+    """
+
+    limiter = Limiter(
+        key_func=get_remote_addr,
+        default_deduct_when=lambda req, resp, resource, req_succeeded: resp.status == HTTP_200,
+        default_dynamic_limits=lambda req, resp, resource, req_succeeded: '1/second'
+    )
+
+    @limiter.limit()
+    class ThingsResource:
+        def on_get(self, req, resp):
+            resp.data = _HELLO
+
+        def on_post(self, req, resp):
+            resp.data = _HELLO
+            resp.status = HTTP_500
+
+    app = API(middleware=limiter.middleware)
+    app.add_route('/things', ThingsResource())
+
+    client = testing.TestClient(app)
+
+    # this is a 500 response, so it should NOT count!
+    r = client.simulate_post('/things')
+    assert r.status_code == 500
+
+    r = client.simulate_get('/things')
+    assert r.status_code == 200
+
+    # due to the 1/second dynamic limit
+    r = client.simulate_get('/things')
+    assert r.status_code == 429
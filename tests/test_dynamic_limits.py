@@ -1,12 +1,13 @@
 """ Testing the dynamic_limits option
 """
-from falcon import API, testing, HTTP_200, HTTP_429, HTTP_500
+import pytest
+from falcon import API, testing
 from falcon_limiter import Limiter
 from falcon_limiter.utils import get_remote_addr
-from time import sleep
+from tests.conftest import _HELLO, default_strategy_only, fast_get
 
 
-def test_default_dynamic_limits():
+def test_default_dynamic_limits(frozen_clock):
     """ Test using the default_dynamic_limits option to change the limit per user
     """
 
@@ -19,7 +20,7 @@ def test_default_dynamic_limits():
     @limiter.limit()
     class ThingsResource:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     app = API(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
@@ -29,212 +30,152 @@ def test_default_dynamic_limits():
     ####
     # 'normal' user - errors after more than 2 calls per sec
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 2/second limit
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     #########
     # 'admin' user should be able to make 5 calls
     admin_header = {"APIUSER": "admin"}
     for i in range(5):
-        r = client.simulate_get('/things', headers=admin_header)
-        assert r.status == HTTP_200
+        assert fast_get(app, '/things', headers=admin_header) == 200
 
     # at the 6th hit even the admin user will error:
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_dynamic_limits_on_method():
-    """ Test using the dynamic_limits param of the method decorators to change the limit per user
+def admin_limits(req, resp, resource, req_succeeded):
+    """ The dynamic limits used by the tests - the 'admin' user gets a higher limit
     """
+    return '5/second' if req.get_header('APIUSER') == 'admin' else '2/second'
 
-    limiter = Limiter(
-        key_func=get_remote_addr,
-        default_limits=["10 per hour", "1 per second"]
-    )
 
+def method_resource(limiter):
+    """ The dynamic limits are on the on_get() method, the on_post() method has no limit
+    """
     class ThingsResource:
-        @limiter.limit(dynamic_limits=lambda req, resp, resource, req_succeeded: '5/second'
-            if req.get_header('APIUSER') == 'admin' else '2/second')
+        @limiter.limit(dynamic_limits=admin_limits)
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = API(middleware=limiter.middleware)
-    app.add_route('/things', ThingsResource())
+    return ThingsResource
 
-    client = testing.TestClient(app)
 
-    ####
-    # 'normal' user - errors after more than 2 calls per sec
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
-
-    # due to the 2/second limit
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_429
-
-    #########
-    # 'admin' user should be able to make 5 calls
-    admin_header = {"APIUSER": "admin"}
-    for i in range(5):
-        r = client.simulate_get('/things', headers=admin_header)
-        assert r.status == HTTP_200
-
-    # at the 6th hit even the admin user will error:
-    r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_429
-
-    sleep(1)
-    r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_200
-
-    ########
-    # unlimited number of calls to the unlimited on_post() method
-    for i in range(8):
-        r = client.simulate_post('/things')
-        assert r.status == HTTP_200
-
-
-def test_dynamic_limits_on_method2():
-    """ Test using the dynamic_limits param of the method decorators to change the limit per user
-
-    Overwriting the default limits from the class level decortor
+def method_override_resource(limiter):
+    """ The dynamic limits of the on_get() method overwrite the default limits from the class level decorator
     """
-
-    limiter = Limiter(
-        key_func=get_remote_addr,
-        default_limits=["10 per hour", "1 per second"]
-    )
-
     @limiter.limit()
     class ThingsResource:
-        @limiter.limit(dynamic_limits=lambda req, resp, resource, req_succeeded: '5/second'
-            if req.get_header('APIUSER') == 'admin' else '2/second')
+        @limiter.limit(dynamic_limits=admin_limits)
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = API(middleware=limiter.middleware)
-    app.add_route('/things', ThingsResource())
+    return ThingsResource
 
-    client = testing.TestClient(app)
 
-    ####
-    # 'normal' user - errors after more than 2 calls per sec
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
-
-    # due to the 2/second limit
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_429
-
-    #########
-    # 'admin' user should be able to make 5 calls
-    admin_header = {"APIUSER": "admin"}
-    for i in range(5):
-        r = client.simulate_get('/things', headers=admin_header)
-        assert r.status == HTTP_200
-
-    # at the 6th hit even the admin user will error:
-    r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_429
-
-    sleep(1)
-    r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_200
-
-    ########
-    # the on_post() method gets the default limit - 1 per second
-    r = client.simulate_post('/things', headers=admin_header)
-    assert r.status == HTTP_200
-
-    r = client.simulate_post('/things', headers=admin_header)
-    assert r.status == HTTP_429
-
-
-def test_dynamic_limits_on_class():
-    """ Test using the dynamic_limits param of the class decorators to change the limit per user
+def class_resource(limiter):
+    """ The dynamic limits are on the class, the on_post() method has its own limit
     """
-
-    limiter = Limiter(
-        key_func=get_remote_addr,
-        default_limits=["10 per hour", "1 per second"]
-    )
-
-    @limiter.limit(dynamic_limits=lambda req, resp, resource, req_succeeded: '5/second'
-        if req.get_header('APIUSER') == 'admin' else '2/second')
+    @limiter.limit(dynamic_limits=admin_limits)
     class ThingsResource:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         @limiter.limit(limits="3/second")
         def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
+
+    return ThingsResource
+
+
+@default_strategy_only('limiter')
+@pytest.mark.parametrize("decorator_site", ["method", "method_override", "class"])
+def test_dynamic_limits_decorators(limiter, frozen_clock, decorator_site):
+    """ Test using the dynamic_limits param of the method or class decorators to change the limit per user
+    """
+    resource_factory = {
+        "method": method_resource,
+        "method_override": method_override_resource,
+        "class": class_resource,
+    }[decorator_site]
 
     app = API(middleware=limiter.middleware)
-    app.add_route('/things', ThingsResource())
+    app.add_route('/things', resource_factory(limiter)())
 
     client = testing.TestClient(app)
 
     ####
     # 'normal' user - errors after more than 2 calls per sec
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 2/second limit
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     #########
     # 'admin' user should be able to make 5 calls
     admin_header = {"APIUSER": "admin"}
     for i in range(5):
-        r = client.simulate_get('/things', headers=admin_header)
-        assert r.status == HTTP_200
+        assert fast_get(app, '/things', headers=admin_header) == 200
 
     # at the 6th hit even the admin user will error:
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things', headers=admin_header)
-    assert r.status == HTTP_200
+    assert r.status_code == 200
+
+    if decorator_site == "method":
+        ########
+        # unlimited number of calls to the unlimited on_post() method
+        for i in range(8):
+            r = client.simulate_post('/things')
+            assert r.status_code == 200
+
+    elif decorator_site == "method_override":
+        ########
+        # the on_post() method gets the default limit - 1 per second
+        r = client.simulate_post('/things', headers=admin_header)
+        assert r.status_code == 200
+
+        r = client.simulate_post('/things', headers=admin_header)
+        assert r.status_code == 429
+
+    else:
+        ########
+        # the on_post() method has a limit of 3/second - for normal users
+        for i in range(3):
+            r = client.simulate_post('/things')
+            assert r.status_code == 200
 
-    ########
-    # the on_post() method has a limit of 3/second - for normal users
-    for i in range(3):
         r = client.simulate_post('/things')
-        assert r.status == HTTP_200
+        assert r.status_code == 429
 
-    r = client.simulate_post('/things')
-    assert r.status == HTTP_429
+        ########
+        # the on_post() method has a limit of 3/second - for admin users too
+        frozen_clock.tick(1.01)
+        for i in range(3):
+            r = client.simulate_post('/things', headers=admin_header)
+            assert r.status_code == 200
 
-    ########
-    # the on_post() method has a limit of 3/second - for admin users too
-    sleep(1)
-    for i in range(3):
         r = client.simulate_post('/things', headers=admin_header)
-        assert r.status == HTTP_200
-
-    r = client.simulate_post('/things', headers=admin_header)
-    assert r.status == HTTP_429
+        assert r.status_code == 429
@@ -1,13 +1,13 @@
 """ Tests with different key_func
 """
-from falcon import API, testing, HTTP_200, HTTP_429
+from falcon import API, testing
 from falcon_limiter import Limiter
 from falcon_limiter.utils import get_remote_addr
+from tests.conftest import _HELLO, apply_limit
 import pytest
-from time import sleep
 
 
-def test_get_remote_addr():
+def test_get_remote_addr(frozen_clock):
     """ Test using the get_remote_addr() key function as default
     """
 
@@ -16,25 +16,22 @@ def test_get_remote_addr():
         default_limits=["10 per hour", "1 per second"]
     )
 
-    @limiter.limit()
-    class ThingsResource:
-        def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+    ThingsResource = apply_limit(limiter)
 
     app = API(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
     client = testing.TestClient(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
 def test_reverse_proxies():
@@ -51,10 +48,7 @@ def test_reverse_proxies():
         default_limits=["10 per hour", "1 per second"]
     )
 
-    @limiter.limit()
-    class ThingsResource:
-        def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+    ThingsResource = apply_limit(limiter)
 
     # two different source IPs through 1 reverse proxy:
     ip1_header = {"X-FORWARDED-FOR": "10.0.0.1, 1.2.3.4"}
@@ -65,15 +59,15 @@ def test_reverse_proxies():
 
     client = testing.TestClient(app)
     r = client.simulate_get('/things', headers=ip1_header)
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # the same IP is denied
     r = client.simulate_get('/things', headers=ip1_header)
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     # but a different IP can still access it
     r = client.simulate_get('/things', headers=ip2_header)
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
 def test_limit_by_resource_and_method():
@@ -89,27 +83,21 @@ def test_limit_by_resource_and_method():
         default_limits=["10 per hour", "1 per second"]
     )
 
-    @limiter.limit()
-    class ThingsResource:
-        def on_get(self, req, resp):
-            resp.body = 'Hello world!'
-
-        def on_post(self, req, resp):
-            resp.body = 'Hello world!'
+    ThingsResource = apply_limit(limiter)
 
     app = API(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
     client = testing.TestClient(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
     # but a different endpoint can still be hit
     r = client.simulate_post('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
 # We can't test this anymore, as errors raised in the key no longer
@@ -130,7 +118,7 @@ def test_limit_by_resource_and_method():
 #     @limiter.limit(key_func=get_key)
 #     class ThingsResource:
 #         def on_get(self, req, resp):
-#             resp.body = 'Hello world!'
+#             resp.data = _HELLO
 #
 #     app = API(middleware=limiter.middleware)
 #     app.add_route('/things', ThingsResource())
@@ -161,7 +149,7 @@ def test_limit_by_resource_and_method():
 #     class ThingsResource:
 #         @limiter.limit(limits="1 per minute", key_func=get_key)
 #         def on_get(self, req, resp):
-#             resp.body = 'Hello world!'
+#             resp.data = _HELLO
 #
 #     app = API(middleware=limiter.middleware)
 #     app.add_route('/things', ThingsResource())
@@ -1,49 +1,49 @@
 """ Test the different scenarios of limiter.py
 """
-from falcon import API, testing, HTTP_200, HTTP_429, HTTP_405
+import pytest
+from falcon import API, testing
 from falcon_limiter import Limiter
 from falcon_limiter.utils import get_remote_addr
-from time import sleep
+from limits.storage import storage_from_string
+from tests.conftest import _HELLO, default_strategy_only
 
 
-def test_default_limit(limiter):
+def test_default_limit(limiter, app_factory, frozen_clock):
     """ Test the default limit applied through the class decorator
     """
     @limiter.limit()
     class ThingsResource:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
         def some_other_method(self):
             pass
 
-    app = API(middleware=limiter.middleware)
-    app.add_route('/things', ThingsResource())
-
-    client = testing.TestClient(app)
+    client = app_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
+    assert r.json['title'] == 'Reached allowed limit 1 hits per 1 second!'
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_no_limit(limiter):
+def test_no_limit(limiter, frozen_clock):
     """ Test a no limit resource even when another resource has a limit
     """
     @limiter.limit()
     class ThingsResource:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     class ThingsResourceNoLimit:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     app = API(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
@@ -51,305 +51,397 @@ def test_no_limit(limiter):
 
     client = testing.TestClient(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
-    for i in range(3):
-        r = client.simulate_get('/thingsnolimit')
-        assert r.status == HTTP_200
+    r = client.simulate_get('/thingsnolimit')
+    assert r.status_code == 200
+
+
+@default_strategy_only('limiter')
+@pytest.mark.parametrize("i", range(3))
+def test_no_limit_repeat(i, client):
+    """ Test the i-th repeated call of a no limit resource, while the other resource is over its limit
+    """
+    client.simulate_get('/things')
+    assert client.simulate_get('/things').status_code == 429
+
+    for _ in range(i):
+        client.simulate_get('/thingsnolimit')
+    assert client.simulate_get('/thingsnolimit').status_code == 200
 
 
-def test_limit_on_method(limiter):
+def test_limit_on_method(limiter, app_factory, frozen_clock):
     """ Test the limit decorator on the method
     """
     class ThingsResource:
         @limiter.limit()
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = API(middleware=limiter.middleware)
-    app.add_route('/things', ThingsResource())
-
-    client = testing.TestClient(app)
+    client = app_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     # due to the 1 second default limit on the default limiter
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_limit_on_method_overwrite(limiter):
+def test_limit_on_method_overwrite(limiter, app_factory, frozen_clock):
     """ Test the limit decorator on the method overwriting the default limit
     """
     class ThingsResource:
         # the default limit on 'limiter' is 1 per second
         @limiter.limit(limits="2 per second")
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = API(middleware=limiter.middleware)
-    app.add_route('/things', ThingsResource())
-
-    client = testing.TestClient(app)
+    client = app_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_limit_on_method_overwrite_multiple(limiter):
-    """ Test the limit decorator on the method overwriting the default limit
-    with a combined limit
+@pytest.mark.parametrize("limits_arg", [
+    "5 per hour;2 per second",
+    "5 per hour;2/second",
+    ["5 per hour", "2 per second"],
+    "5 per hour,2 per second",
+], ids=["semicolon", "short_notation", "iterable", "comma"])
+def test_limits_forms(limits_arg, limiter, app_factory, frozen_clock):
+    """ Test the limit decorator on the method overwriting the default limit with a combined limit,
+    provided in the different forms accepted
     """
     class ThingsResource:
         # the default limit on 'limiter' is 1 per second
-        @limiter.limit(limits="5 per hour;2 per second")
+        @limiter.limit(limits=limits_arg)
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = API(middleware=limiter.middleware)
-    app.add_route('/things', ThingsResource())
-
-    client = testing.TestClient(app)
+    client = app_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_limit_on_method_overwrite_multiple_short_notation(limiter):
-    """ Test the limit decorator on the method overwriting the default limit
-    with a combined limit
+def test_limit_class(limiter, app_factory, frozen_clock):
+    """ Class level decorator overwriting the default
     """
+    # the default limit on 'limiter' is 1 per second
+    @limiter.limit(limits="5 per hour;2 per second")
     class ThingsResource:
-        # the default limit on 'limiter' is 1 per second
-        @limiter.limit(limits="5 per hour;2/second")
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = API(middleware=limiter.middleware)
-    app.add_route('/things', ThingsResource())
-
-    client = testing.TestClient(app)
+    client = app_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
 
-def test_limit_as_iterable(limiter):
-    """ The limit might be provided as an iterable
+def test_limit_class_and_method(limiter, app_factory, frozen_clock):
+    """ Class level decorator gets overwritten by the method level one
     """
+    # the default limit on 'limiter' is 1 per second
+    @limiter.limit(limits="5 per hour;2 per second")
     class ThingsResource:
-        # the default limit on 'limiter' is 1 per second
-        @limiter.limit(limits=["5 per hour", "2 per second"])
+        # also the limits are in an unusual order:
+        @limiter.limit(limits="3 per second;5 per hour")
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = API(middleware=limiter.middleware)
-    app.add_route('/things', ThingsResource())
-
-    client = testing.TestClient(app)
+    client = app_factory(ThingsResource())
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 200
 
-    sleep(1)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
-
-
-def test_limit_w_commas(limiter):
-    """ The limit might be provided comma-separated
-    """
-    class ThingsResource:
-        # the default limit on 'limiter' is 1 per second
-        @limiter.limit(limits="5 per hour,2 per second")
-        def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+    assert r.status_code == 429
 
-    app = API(middleware=limiter.middleware)
-    app.add_route('/things', ThingsResource())
+    # a rejected request is not counted against the 5 per hour limit, so 2 more requests are allowed
+    # after the second-window resets - 2 seconds, so the previous window is past for every strategy
+    frozen_clock.tick(2.01)
+    r = client.simulate_get('/things')
+    assert r.status_code == 200
 
-    client = testing.TestClient(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
+    # due to the 5 per hour limit
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 429
+    assert r.json['title'] == 'Reached allowed limit 5 hits per 1 hour!'
 
+    frozen_clock.tick(2.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
 
-    sleep(1)
+    # the hour-window resets too
+    frozen_clock.tick(2 * 3600)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
+
 
+def test_empy_limits():
+    """ Test incorrect setup - empty limits!
 
-def test_limit_w_semicol(limiter):
-    """ The limit might be provided semicol-separated
+    In this case there are NO limits applied
     """
+
+    limiter = Limiter(
+        key_func=get_remote_addr
+    )
+
+    @limiter.limit()
     class ThingsResource:
-        # the default limit on 'limiter' is 1 per second
-        @limiter.limit(limits="5 per hour;2 per second")
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     app = API(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
     client = testing.TestClient(app)
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    for i in range(5):
+        r = client.simulate_get('/things')
+        assert r.status_code == 200
 
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
 
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+@default_strategy_only('limiter')
+def test_undefined_endpoint(limiter, app_factory):
+    """ Test calling a method which is not defined at all
 
-    sleep(1)
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    Our module should not error, but we should leave it to Falcon to handle it - and return a 405.
+    """
+    @limiter.limit()
+    class ThingsResource:
+        def on_get(self, req, resp):
+            resp.data = _HELLO
 
+    client = app_factory(ThingsResource())
+    r = client.simulate_post('/things')
+    assert r.status_code == 405
 
-def test_limit_class(limiter):
-    """ Class level decorator overwriting the default
+
+def test_shared_storage():
+    """ Test passing an already built storage in the 'RATELIMIT_STORAGE' config, shared by two limiters
     """
-    # the default limit on 'limiter' is 1 per second
-    @limiter.limit(limits="5 per hour;2 per second")
+    storage = storage_from_string('memory://')
+    limiter1 = Limiter(default_limits="1 per second", config={'RATELIMIT_STORAGE': storage})
+    limiter2 = Limiter(default_limits="1 per second", config={'RATELIMIT_STORAGE': storage})
+    assert limiter1.storage is limiter2.storage is storage
+
+    @limiter1.limit()
     class ThingsResource:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = API(middleware=limiter.middleware)
+    client1 = testing.TestClient(API(middleware=limiter1.middleware))
+    client1.app.add_route('/things', ThingsResource())
+    client2 = testing.TestClient(API(middleware=limiter2.middleware))
+    client2.app.add_route('/things', ThingsResource())
+
+    r = client1.simulate_get('/things')
+    assert r.status_code == 200
+
+    # the hit is counted in the shared storage, so the other limiter rejects the same key too
+    r = client2.simulate_get('/things')
+    assert r.status_code == 429
+
+
+def test_reject_cache(monkeypatch, frozen_clock):
+    """ Test the 'RATELIMIT_REJECT_CACHE' config, where the rejected keys are remembered
+    until the window resets, so the storage doesn't need to be hit for them
+    """
+    limiter = Limiter(
+        key_func=get_remote_addr,
+        default_limits="1 per second",
+        config={'RATELIMIT_REJECT_CACHE': True}
+    )
+
+    @limiter.limit()
+    class ThingsResource:
+        def on_get(self, req, resp):
+            resp.data = _HELLO
+
+    middleware = limiter.middleware
+    app = API(middleware=middleware)
     app.add_route('/things', ThingsResource())
 
     client = testing.TestClient(app)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
 
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 429
 
+    # the rejection is served from the cache, without hitting the storage
+    hits = []
+    original_hit = middleware._hit
+    monkeypatch.setattr(middleware, '_hit', lambda *args: hits.append(args) or original_hit(*args))
     r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+    assert r.status_code == 429
+    assert not hits
 
-    sleep(1)
+    frozen_clock.tick(1.01)
     r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    assert r.status_code == 200
+    assert len(hits) == 1
 
 
-def test_limit_class_and_method(limiter):
-    """ Class level decorator gets overwritten by the method level one
+def test_reject_cache_size():
+    """ Test the 'RATELIMIT_REJECT_CACHE_SIZE' config, where only the most recently rejected keys are remembered
     """
-    # the default limit on 'limiter' is 1 per second
-    @limiter.limit(limits="5 per hour;2 per second")
+    limiter = Limiter(
+        key_func=get_remote_addr,
+        default_limits="1 per second",
+        config={'RATELIMIT_REJECT_CACHE': True, 'RATELIMIT_REJECT_CACHE_SIZE': 1}
+    )
+    assert limiter.reject_cache.maxsize == 1
+
+    @limiter.limit()
     class ThingsResource:
-        # also the limits are in an unusual order:
-        @limiter.limit(limits="3 per second;5 per hour")
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
     app = API(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
 
     client = testing.TestClient(app)
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    for remote_addr in ('10.0.0.1', '10.0.0.2'):
+        for status_code in (200, 429):
+            r = client.simulate_get('/things', remote_addr=remote_addr)
+            assert r.status_code == status_code
 
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    # only the last rejected key is kept
+    limit = limiter.middleware._limit_meta[(ThingsResource, 'GET')].parsed_limits[0]
+    assert (limit, '10.0.0.2') in limiter.reject_cache
+    assert (limit, '10.0.0.1') not in limiter.reject_cache
 
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
 
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_429
+def test_limit_class_shared_responder(limiter):
+    """ The same function being the responder of two classes with different class level limits
+    """
+    def get_things(self, req, resp):
+        resp.data = _HELLO
 
-    sleep(1)
-    r = client.simulate_get('/things')
-    assert r.status == HTTP_200
+    @limiter.limit(limits="1 per second")
+    class ThingsResource:
+        on_get = get_things
 
+    @limiter.limit(limits="50 per second")
+    class OtherThingsResource:
+        on_get = get_things
 
-def test_empy_limits():
-    """ Test incorrect setup - empty limits!
+    app = API(middleware=limiter.middleware)
+    app.add_route('/things', ThingsResource())
+    app.add_route('/otherthings', OtherThingsResource())
 
-    In this case there are NO limits applied
-    """
+    client = testing.TestClient(app)
+    assert [client.simulate_get('/otherthings').status_code for _ in range(3)] == [200, 200, 200]
+    assert [client.simulate_get('/things').status_code for _ in range(3)] == [200, 429, 429]
 
-    limiter = Limiter(
-        key_func=get_remote_addr
-    )
 
-    @limiter.limit()
-    class ThingsResource:
+def test_limit_class_inherited_method(limiter):
+    """ Class level decorator on a subclass does not limit the methods of its parent class
+    """
+    class BaseResource:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
+
+    @limiter.limit()
+    class ThingsResource(BaseResource):
+        pass
 
     app = API(middleware=limiter.middleware)
     app.add_route('/things', ThingsResource())
+    app.add_route('/base', BaseResource())
 
     client = testing.TestClient(app)
-    for i in range(5):
-        r = client.simulate_get('/things')
-        assert r.status == HTTP_200
+    r = client.simulate_get('/things')
+    assert r.status_code == 200
 
+    # due to the 1 second default limit on the default limiter
+    r = client.simulate_get('/things')
+    assert r.status_code == 429
 
-def test_undefined_endpoint(limiter):
-    """ Test calling a method which is not defined at all
+    for i in range(3):
+        r = client.simulate_get('/base')
+        assert r.status_code == 200
 
-    Our module should not error, but we should leave it to Falcon to handle it - and return a 405.
+
+@default_strategy_only('fresh_limiter')
+def test_finalize(fresh_limiter):
+    """ Test resolving the limit settings of all the resources before the first request
     """
-    @limiter.limit()
+    @fresh_limiter.limit()
     class ThingsResource:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
 
-    app = API(middleware=limiter.middleware)
+    class NoLimitResource:
+        def on_get(self, req, resp, thing_id):
+            resp.data = _HELLO
+
+    app = API(middleware=fresh_limiter.middleware)
     app.add_route('/things', ThingsResource())
+    app.add_route('/things/{thing_id}/nolimit', NoLimitResource())
+    fresh_limiter.finalize(app)
+
+    assert fresh_limiter.middleware._limit_meta[(ThingsResource, 'GET')].parsed_limits
+    assert fresh_limiter.middleware._limit_meta[(NoLimitResource, 'GET')] is None
 
     client = testing.TestClient(app)
-    r = client.simulate_post('/things')
-    assert r.status == HTTP_405
+    r = client.simulate_get('/things')
+    assert r.status_code == 200
+
+    # due to the 1 second default limit on the default limiter
+    r = client.simulate_get('/things')
+    assert r.status_code == 429
+
+    for i in range(3):
+        r = client.simulate_get('/things/1/nolimit')
+        assert r.status_code == 200
@@ -1,7 +1,9 @@
 from falcon import API, testing
-from falcon_limiter.utils import get_remote_addr
+from falcon_limiter.utils import get_remote_addr, register
+from tests.conftest import _HELLO, default_strategy_only
 
 
+@default_strategy_only('limiter')
 def test_get_remote_addr(limiter):
     """ Test the utils.get_remote_addr() function which returns the requestor's ip
 
@@ -11,7 +13,7 @@ def test_get_remote_addr(limiter):
     @limiter.limit()
     class ThingsResource:
         def on_get(self, req, resp):
-            resp.body = 'Hello world!'
+            resp.data = _HELLO
             assert '127.0.0.1' == get_remote_addr(req, resp, None, None)
 
     app = API(middleware=limiter.middleware)
@@ -20,3 +22,33 @@ def test_get_remote_addr(limiter):
 
     client = testing.TestClient(app)
     client.simulate_get('/things')
+
+
+@default_strategy_only('limiter')
+def test_register(limiter):
+    """ Test the utils.register() function hoisting the arguments of the limit() decorator
+    onto the outermost wrapper
+    """
+    def a_decorator(f):
+        def wrapper(*args, **kwargs):
+            return f(*args, **kwargs)
+        return wrapper
+
+    limit = limiter.limit(limits="2 per second")
+
+    # the class level decorator does not overwrite the limit of the method
+    @limiter.limit()
+    class ThingsResource:
+        @register(a_decorator, limit)
+        def on_get(self, req, resp):
+            resp.data = _HELLO
+
+    assert ThingsResource.on_get._decorators == (a_decorator, limit)
+    assert ThingsResource.on_get._limit_spec is limit._limit_spec
+
+    # and the middleware applies the limit of the method instead of the default "1 per second"
+    app = API(middleware=limiter.middleware)
+    app.add_route('/things', ThingsResource())
+
+    client = testing.TestClient(app)
+    assert [client.simulate_get('/things').status_code for _ in range(3)] == [200, 200, 429]